@@ -0,0 +1,153 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+
+from connect4 import ALGORITHMS, run_pmcgs, TIMED_ENGINES
+from position import PLAYERS, parse_rows
+from budget import Budget, parse_param
+from instrument import SearchStats
+from parallel import stream_seed
+
+# Batch analysis: run one engine over a corpus of positions and stream the results.
+# Usage: python analyze.py <directory | positions.jsonl> --engine UCT --param 1000 --out results.jsonl
+#
+# A directory holds files in the read_input format (algorithm, player, then the board
+# rows); a JSONL file holds one {"id", "player", "board": [row strings]} object per
+# line. Each result line has the record's "id" and a "status": "ok" with the best
+# "column" (1-based), per-column "values" (win rates from 0 to 1, null for columns
+# not searched), "sims" and "ms"; "won" with the "winner" for a board that is
+# already decided; "full" for a board with no moves left; or "error" with a message.
+# Results are written as they finish, not in input order.
+
+MAX_PENDING_PER_WORKER = 4  # records read ahead of the workers, which bounds memory
+
+
+def directory_records(path):
+    # ("file", id, path) for every file in a directory, streamed from the listing
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield "file", entry.name, entry.path
+
+
+def jsonl_records(path):
+    # ("json", id, line) for every non-blank line, the id defaulting to the line number
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield "json", f"{os.path.basename(path)}:{number}", line
+
+
+def read_records(path):
+    return directory_records(path) if os.path.isdir(path) else jsonl_records(path)
+
+
+def parse_record(kind, ident, payload):
+    # (id, player, Position) from a raw record, or a ValueError
+    if kind == "file":
+        with open(payload, "r") as f:
+            lines = [line.strip() for line in f.readlines()]
+        if len(lines) < 3:
+            raise ValueError("Expected an algorithm line, a player line and the board rows.")
+        player, rows = lines[1], [line for line in lines[2:] if line]
+    else:
+        try:
+            record = json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Bad JSON: {e}")
+        if not isinstance(record, dict):
+            raise ValueError("Expected a JSON object.")
+        ident = record.get("id", ident)
+        player, rows = record.get("player"), record.get("board")
+    if player not in PLAYERS:
+        raise ValueError(f"Player is one of {', '.join(PLAYERS)}.")
+    return ident, player, parse_rows(rows)
+
+
+def analyze_record(task):
+    # Runs in a worker process: parse and search one record; never raises
+    (kind, ident, payload), algorithm, param, time_ms = task
+    result = {"id": ident}
+    try:
+        ident, player, pos = parse_record(kind, ident, payload)
+        result["id"] = ident
+        winner = next((p for p in PLAYERS if pos.is_win(p)), None)
+        if winner is not None:
+            return dict(result, status="won", winner=winner)
+        if not pos.legal_moves():
+            return dict(result, status="full")
+        random.seed(stream_seed("analyze", ident))
+        engine = ALGORITHMS[algorithm]
+        stats = SearchStats(algorithm)
+        options = {"search_stats": stats}
+        if engine in TIMED_ENGINES:
+            # PMCGS counts its simulations per column
+            sims = param * len(pos.legal_moves()) if engine is run_pmcgs and param else param
+            options["budget"] = budget = Budget(sims, time_ms)
+        _, move = engine(pos.to_board(), player, param, False, **options)
+        return dict(result, status="ok", player=player, column=move + 1, values=stats.values,
+                    sims=budget.sims if engine in TIMED_ENGINES else 0,
+                    ms=round(stats.elapsed * 1000, 3))
+    except Exception as e:  # a bad record must not stop the run
+        return dict(result, status="error", error=f"{type(e).__name__}: {e}")
+
+
+def analyze(records, out, algorithm="UCT", param=1000, time_ms=None, workers=None, on_result=None):
+    """
+    Search every record from the iterable `records` (see read_records) with
+    `algorithm` across a process pool, writing one JSON result line to the
+    open file `out` as each one finishes. At most a few records per worker
+    are in flight at once, so memory stays flat however long the corpus is.
+    Returns a count of results by status.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown engine {algorithm}; choose from {', '.join(ALGORITHMS)}.")
+    workers = workers or os.cpu_count() or 1
+    slots = threading.BoundedSemaphore(workers * MAX_PENDING_PER_WORKER)
+    counts = {}
+
+    def done(result):
+        # Called on the pool's result thread, one result at a time
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        if on_result is not None:
+            on_result(result)
+        slots.release()
+
+    with multiprocessing.Pool(workers) as pool:
+        for record in records:
+            slots.acquire()
+            pool.apply_async(analyze_record, ((record, algorithm, param, time_ms),), callback=done,
+                             error_callback=lambda e, ident=record[1]: done(
+                                 {"id": ident, "status": "error", "error": f"{type(e).__name__}: {e}"}))
+        pool.close()
+        pool.join()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a corpus of Connect Four positions")
+    parser.add_argument("input", help="directory of input files, or a JSONL file of positions")
+    parser.add_argument("--engine", default="UCT", help=f"one of {', '.join(ALGORITHMS)}")
+    parser.add_argument("--param", default="1000", help="simulations, or a time budget such as 250ms")
+    parser.add_argument("--out", default=None, help="JSONL results file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    param, time_ms = parse_param(args.param)
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        counts = analyze(read_records(args.input), out, args.engine, param, time_ms, args.workers)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.out:
+            out.close()
+    print(", ".join(f"{n} {status}" for status, n in sorted(counts.items())) or "No records.",
+          file=sys.stderr)
@@ -0,0 +1,101 @@
+try:
+    import numpy as np
+except ImportError:  # batched playouts are optional
+    np = None
+
+from position import ROWS, COLUMNS, STANDARD
+
+# Batched boards are flat int8 arrays indexed by col * ROWS + height, with one
+# extra always-empty cell at the end that pads the per-cell window tables.
+CELLS = ROWS * COLUMNS
+PAD = CELLS
+EMPTY_CELL, RED, YELLOW = 0, 1, 2
+H1, CELL_WINDOWS = STANDARD.h1, STANDARD.cell_windows  # bitboard layout of the standard board
+
+
+def _build_tables():
+    # For each cell, the cell indices of every four-cell line through it,
+    # padded to a fixed number of lines with windows made of the pad cell.
+    width = max(len(w) for w in CELL_WINDOWS)
+    table = np.full((CELLS, width, 4), PAD, dtype=np.intp)
+    for col in range(COLUMNS):
+        for height in range(ROWS):
+            for i, window in enumerate(CELL_WINDOWS[col * H1 + height]):
+                cells = [c * ROWS + h for c in range(COLUMNS) for h in range(ROWS)
+                         if window >> (c * H1 + h) & 1]
+                table[col * ROWS + height, i] = cells
+    return table
+
+
+_CELL_LINES = None
+
+
+def cell_lines():
+    global _CELL_LINES
+    if _CELL_LINES is None:
+        _CELL_LINES = _build_tables()
+    return _CELL_LINES
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Batched rollouts need NumPy (pip install numpy).")
+
+
+def to_array(pos):
+    # Flatten a Position into the batched board layout
+    cells = np.zeros(CELLS + 1, dtype=np.int8)
+    red, yellow = pos.bits
+    for col in range(COLUMNS):
+        for height in range(pos.heights[col]):
+            b = 1 << (col * H1 + height)
+            cells[col * ROWS + height] = RED if red & b else YELLOW
+    return cells
+
+
+def batch_playouts(pos, current_player, turn, n, rng=None):
+    """
+    Play n uniformly random games from pos in lockstep, `turn` moving first.
+    Returns an int8 array of outcomes: +1 if current_player won that game,
+    -1 if the other player won, 0 for a draw. pos is not modified.
+    """
+    require_numpy()
+    if pos.geo is not STANDARD:
+        raise ValueError("Batched rollouts only play the standard board.")
+    if rng is None:
+        rng = np.random.default_rng()
+    lines = cell_lines()
+    boards = np.tile(to_array(pos), (n, 1))
+    heights = np.tile(np.array(pos.heights, dtype=np.intp), (n, 1))
+    outcome = np.zeros(n, dtype=np.int8)
+    live = np.arange(n)
+
+    while live.size:
+        h = heights[live]
+        legal = h < ROWS
+        # Games with no legal move left are draws
+        open_games = legal.any(axis=1)
+        if not open_games.all():
+            live, h, legal = live[open_games], h[open_games], legal[open_games]
+            if not live.size:
+                break
+
+        # Uniform choice among legal columns: argmax of masked random scores
+        scores = rng.random(h.shape)
+        scores[~legal] = -1.0
+        cols = scores.argmax(axis=1)
+        cells = cols * ROWS + h[np.arange(live.size), cols]
+
+        piece = RED if turn == 'R' else YELLOW
+        boards[live, cells] = piece
+        heights[live, cols] += 1
+
+        # Only lines through the piece just placed can have been completed
+        line_cells = boards[live[:, None, None], lines[cells]]
+        won = (line_cells == piece).all(axis=2).any(axis=1)
+        if won.any():
+            outcome[live[won]] = 1 if turn == current_player else -1
+            live = live[~won]
+        turn = 'Y' if turn == 'R' else 'R'
+
+    return outcome
@@ -0,0 +1,40 @@
+import sys
+import time
+import random
+
+import mcts
+from connect4 import read_input
+from position import Position
+
+# Thread-scaling benchmark for mcts.tree_parallel_search.
+# Usage: python bench_threads.py [sims] [filename]
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+
+def thread_scaling(pos, player, sims, thread_counts=THREAD_COUNTS, policy="uct"):
+    # Simulations per second at each thread count, on a fresh tree each time
+    results = []
+    for threads in thread_counts:
+        random.seed(threads)
+        start = time.perf_counter()
+        root = mcts.tree_parallel_search(pos, player, sims, policy, threads=threads, force=True)
+        elapsed = time.perf_counter() - start
+        results.append({"threads": threads, "sims": root.visits, "seconds": elapsed,
+                        "sims_per_sec": root.visits / elapsed})
+    return results
+
+
+if __name__ == "__main__":
+    sims = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    if len(sys.argv) > 2:
+        _, player, board = read_input(sys.argv[2])
+        pos = Position.from_board(board)
+    else:
+        player, pos = 'R', Position()
+
+    print(f"GIL enabled: {mcts.gil_enabled()}")
+    results = thread_scaling(pos, player, sims)
+    base = results[0]["sims_per_sec"]
+    print(f"{'threads':>8}{'sims/s':>12}{'speedup':>10}")
+    for r in results:
+        print(f"{r['threads']:>8}{r['sims_per_sec']:>12.0f}{r['sims_per_sec'] / base:>10.2f}")
@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from connect4 import (read_input, do_move, undo_move, check_win, simulate_random_game_verbose,
+                      run_pmcgs, run_uct, run_uct_rave, run_uct_pb)
+from position import Position, geometry, other, random_playout
+from mcts import SearchTree, search
+from playout import PLAYOUTS
+
+# Benchmark suite for the playout and search hot paths.
+# Usage: python benchmarks.py [--out results.json] [--baseline baseline.json] [--quick]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_FILES = ["input1.txt", "input2.txt", "ur.txt", "firstTest.txt"]
+SEED = 12345
+REPEATS = 3  # each workload keeps its best of this many runs
+THRESHOLD = 0.10  # relative slowdown reported as a regression
+CUTOFF = 10  # rollout cutoff of the cut-off playout workload
+# Board variants of the scaling workload, as (rows, columns, k in a row)
+VARIANTS = [(6, 7, 4), (9, 10, 5), (12, 14, 6)]
+
+ENGINES = [
+    ("PMCGS", run_pmcgs, 100),  # simulations per column
+    ("UCT", run_uct, 1000),
+    ("UCT-RAVE", run_uct_rave, 1000),
+    ("UCT-PB", run_uct_pb, 1000),
+]
+
+
+def random_position(plies, seed):
+    # A reproducible mid-game position reached by `plies` random moves with no winner
+    rng = random.Random(seed)
+    while True:
+        pos, player = Position(), 'R'
+        for _ in range(plies):
+            col = rng.choice(pos.legal_moves())
+            pos.play(col, player)
+            if pos.wins_at(col):
+                break
+            player = other(player)
+        else:
+            return player, pos.to_board()
+
+
+def load_corpus():
+    # The repo's sample boards plus a few fixed random mid-game positions
+    corpus = []
+    for name in CORPUS_FILES:
+        _, player, board = read_input(os.path.join(HERE, name))
+        corpus.append((name, player, board))
+    for plies in (8, 16, 24):
+        player, board = random_position(plies, SEED + plies)
+        corpus.append((f"random{plies}", player, board))
+    return corpus
+
+
+def best_time(fn, repeats=REPEATS):
+    # Fastest of `repeats` runs, each started from the same seed
+    best = float("inf")
+    for _ in range(repeats):
+        random.seed(SEED)
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_move_ops(n):
+    # do_move/undo_move/check_win on list boards and play/undo/wins_at on Position
+    results = {}
+    board = [row[:] for row in read_input(os.path.join(HERE, "ur.txt"))[2]]
+    moves = [i % 7 for i in range(n)]
+
+    def list_board():
+        for col in moves:
+            row = do_move(board, col, 'R')
+            check_win(board, 'R')
+            undo_move(board, col, row)
+
+    pos = Position.from_board(board)
+
+    def bitboard():
+        for col in moves:
+            pos.play(col, 'R')
+            pos.wins_at(col)
+            pos.undo(col)
+
+    results["move_ops.list_board"] = metric(n / best_time(list_board), "ops/s")
+    results["move_ops.position"] = metric(n / best_time(bitboard), "ops/s")
+    return results
+
+
+def bench_playouts(corpus, n):
+    # simulate_random_game_verbose playouts per second from each corpus position
+    results = {}
+    for name, player, board in corpus:
+        pos = Position.from_board(board)
+
+        def playouts():
+            for _ in range(n):
+                simulate_random_game_verbose(pos, player, other(player), False)
+
+        results[f"playouts.{name}"] = metric(n / best_time(playouts), "playouts/s")
+    return results
+
+
+def bench_playout_policies(corpus, n):
+    # Playouts per second of each playout policy over the whole corpus, and of
+    # uniform playouts cut off after CUTOFF moves with a static evaluation
+    results = {}
+    policies = dict(PLAYOUTS)
+    policies[f"random.cutoff{CUTOFF}"] = PLAYOUTS["random"].with_cutoff(CUTOFF)
+    for label, policy in policies.items():
+        def playouts():
+            for _, player, board in corpus:
+                pos = Position.from_board(board)
+                for _ in range(n):
+                    policy.playout(pos, player, other(player))
+
+        results[f"playout_policy.{label}"] = metric(n * len(corpus) / best_time(playouts), "playouts/s")
+    return results
+
+
+def bench_decisions(corpus, scale):
+    # End-to-end latency of one move for each engine on each corpus position
+    results = {}
+    for engine, fn, sims in ENGINES:
+        sims = max(1, int(sims * scale))
+        for name, player, board in corpus:
+            if not Position.from_board(board).legal_moves():
+                continue
+            seconds = best_time(lambda: fn([row[:] for row in board], player, sims, False))
+            results[f"decision.{engine}.{name}"] = metric(seconds * 1000, "ms", higher_is_better=False)
+    return results
+
+
+def bench_tree_memory(sims, max_nodes):
+    # Memory held by one search tree, and the search speed with the node cap forcing pruning
+    results = {}
+    for label, cap in (("tree", None), ("tree.capped", max_nodes)):
+        tree = SearchTree() if cap is None else SearchTree(max_nodes=cap)
+        start = time.perf_counter()
+        search(Position(), 'R', sims, "uct", tree)
+        seconds = time.perf_counter() - start
+        stats = tree.store.stats(tree.root)
+        results[f"{label}.bytes_per_node"] = metric(stats["bytes_per_node"], "bytes", higher_is_better=False)
+        results[f"{label}.sims_per_sec"] = metric(sims / seconds, "sims/s")
+        if cap is not None:
+            results[f"{label}.pruned"] = metric(stats["pruned"], "nodes", higher_is_better=False)
+    return results
+
+
+def bench_scaling(n, sims):
+    # Playout throughput and search tree memory from the empty board of each variant,
+    # to show how they grow with board area
+    results = {}
+    for rows, columns, k in VARIANTS:
+        label = f"scaling.{columns}x{rows}k{k}"
+        pos = Position(geometry(rows, columns, k))
+
+        def playouts():
+            for _ in range(n):
+                random_playout(pos, 'R', 'R')
+
+        def tactical():
+            for _ in range(n):
+                PLAYOUTS["tactical"].playout(pos, 'R', 'R')
+
+        results[f"{label}.playouts"] = metric(n / best_time(playouts), "playouts/s")
+        results[f"{label}.tactical_playouts"] = metric(n / best_time(tactical), "playouts/s")
+        tree = SearchTree()
+        random.seed(SEED)
+        start = time.perf_counter()
+        search(pos, 'R', sims, "uct", tree)
+        seconds = time.perf_counter() - start
+        stats = tree.store.stats(tree.root)
+        results[f"{label}.sims_per_sec"] = metric(sims / seconds, "sims/s")
+        results[f"{label}.bytes_per_node"] = metric(stats["bytes_per_node"], "bytes", higher_is_better=False)
+    return results
+
+
+def metric(value, unit, higher_is_better=True):
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def run_suite(scale=1.0):
+    corpus = load_corpus()
+    results = {}
+    results.update(bench_move_ops(int(20000 * scale)))
+    results.update(bench_playouts(corpus, int(500 * scale)))
+    results.update(bench_playout_policies(corpus, int(200 * scale)))
+    results.update(bench_decisions(corpus, scale))
+    results.update(bench_tree_memory(int(20000 * scale), int(5000 * scale)))
+    results.update(bench_scaling(int(300 * scale), int(5000 * scale)))
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": SEED,
+        "scale": scale,
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    # (name, change) for every metric that got worse by more than threshold;
+    # change is the relative slowdown, e.g. 0.25 = 25% worse than the baseline
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or before["value"] <= 0 or now["value"] <= 0:
+            continue
+        if now["higher_is_better"]:
+            change = before["value"] / now["value"] - 1
+        else:
+            change = now["value"] / before["value"] - 1
+        if change > threshold:
+            regressions.append((name, change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect Four hot-path benchmarks")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against a saved results file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown (0.10 = 10%%)")
+    parser.add_argument("--quick", action="store_true", help="run a tenth of the work")
+    args = parser.parse_args()
+
+    report = run_suite(0.1 if args.quick else 1.0)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, change in regressions:
+            print(f"REGRESSION {name}: {change:.0%} slower than baseline", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.", file=sys.stderr)
@@ -0,0 +1,179 @@
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+from position import ROWS, COLUMNS, STANDARD, Position, other
+from transposition import zobrist, zobrist_step, canonical
+
+# Opening book: a header followed by fixed-size records sorted by canonical
+# Zobrist key, so a lookup is a binary search straight over the mapped file.
+# Moves are stored for the orientation whose hash is the canonical key and
+# mirrored back on lookup.
+# Usage: python book.py [--depth 4] [--engine UCT] [--sims 10000] [--out opening_book.bin]
+
+MAGIC = b"C4BK"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHI")  # magic, rows, columns, version, record count
+RECORD = struct.Struct("<QBB")  # canonical key, move, plies from the start
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+BUILD_SEED = 2024
+
+_open_books = {}
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file, memory-mapped so every process that opens
+    it shares the same pages. lookup() returns the book move for a position
+    (in that position's own orientation) or None.
+    """
+
+    def __init__(self, path=BOOK_FILE):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows, columns, version, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an opening book (version {VERSION}).")
+        if (rows, columns) != (ROWS, COLUMNS):
+            raise ValueError(f"{path} was built for a {columns}x{rows} board.")
+        if HEADER.size + count * RECORD.size > len(self.data):
+            raise ValueError(f"{path} is truncated.")
+        self.count = count
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, key):
+        # (move, plies) stored under a canonical key, or None
+        data, lo, hi = self.data, 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = RECORD.unpack_from(data, HEADER.size + mid * RECORD.size)
+            if record[0] < key:
+                lo = mid + 1
+            elif record[0] > key:
+                hi = mid
+            else:
+                return record[1:]
+        return None
+
+    def lookup(self, pos, hashes=None):
+        if pos.geo is not STANDARD:
+            return None  # books only cover the standard board
+        hashes = hashes or zobrist(pos)
+        found = self.entry(canonical(hashes))
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        move = found[0]
+        return move if hashes[0] <= hashes[1] else COLUMNS - 1 - move
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_book(path=BOOK_FILE):
+    # Shared OpeningBook for path (one mapping per process), or None if there is no such file
+    if path not in _open_books:
+        _open_books[path] = OpeningBook(path) if os.path.exists(path) else None
+    return _open_books[path]
+
+
+def write_book(path, entries):
+    # entries: {canonical key: (move in canonical orientation, plies)}
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, ROWS, COLUMNS, VERSION, len(entries)))
+        for key in sorted(entries):
+            move, plies = entries[key]
+            f.write(RECORD.pack(key, move, plies))
+    os.replace(path + ".tmp", path)
+
+
+def book_positions(depth):
+    # Every position up to `depth` plies with the game still on, one per mirror pair:
+    # (canonical key, hashes, position, player to move, plies)
+    seen = set()
+    frontier = [(zobrist(Position()), Position(), 'R')]
+    for plies in range(depth + 1):
+        next_frontier = []
+        for hashes, pos, player in frontier:
+            key = canonical(hashes)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield key, hashes, pos, player, plies
+            if plies == depth:
+                continue
+            for col in pos.legal_moves():
+                child = pos.copy()
+                child.play(col, player)
+                if not child.wins_at(col):
+                    next_frontier.append((zobrist_step(hashes, col, child.heights[col] - 1, player),
+                                          child, other(player)))
+        frontier = next_frontier
+
+
+def _search_entry(task):
+    # Runs in a worker process: search one book position and return its record
+    from connect4 import ENGINES
+    key, hashes, board, player, plies, engine, sims = task
+    random.seed(BUILD_SEED ^ key)
+    _, move = ENGINES[engine](board, player, sims, False)
+    if hashes[0] > hashes[1]:
+        move = COLUMNS - 1 - move
+    return key, (move, plies)
+
+
+def build_book(depth, engine="UCT", sims=10000, path=BOOK_FILE, workers=None, log=print):
+    """
+    Search every position up to `depth` plies with `engine` and `sims`
+    simulations and write the chosen moves to a book file at path.
+    Returns the number of positions in the book.
+    """
+    from connect4 import ENGINES
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine}; choose from {', '.join(ENGINES)}.")
+    tasks = [(key, hashes, pos.to_board(), player, plies, engine, sims)
+             for key, hashes, pos, player, plies in book_positions(depth)]
+    log(f"Searching {len(tasks)} positions to depth {depth} with {engine} ({sims} simulations).")
+    entries = {}
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers or os.cpu_count() or 1) as pool:
+        for key, entry in pool.imap_unordered(_search_entry, tasks):
+            entries[key] = entry
+            if len(entries) % 50 == 0:
+                log(f"{len(entries)}/{len(tasks)} positions ({time.perf_counter() - start:.0f}s)")
+    write_book(path, entries)
+    log(f"Wrote {len(entries)} positions to {path}.")
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a Connect Four opening book")
+    parser.add_argument("--depth", type=int, default=4, help="plies covered by the book")
+    parser.add_argument("--engine", default="UCT", help="engine that picks the book moves")
+    parser.add_argument("--sims", type=int, default=10000, help="simulations per position")
+    parser.add_argument("--out", default=BOOK_FILE, help="book file to write")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+    try:
+        build_book(args.depth, args.engine, args.sims, args.out, args.workers)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,68 @@
+import time
+
+MAX_CHECK_INTERVAL = 1024  # never go more than this many simulations between clock reads
+
+
+class Budget:
+    """
+    Simulation and/or wall-clock limit for one search; the search stops at
+    whichever runs out first. The clock is only read every `check_every`
+    simulations, and that interval adapts to the measured simulation rate so
+    a check happens roughly every `resolution_ms` milliseconds.
+    After the search, `sims` is the number of simulations actually run.
+    """
+
+    def __init__(self, sims=None, time_ms=None, resolution_ms=2):
+        if sims is None and time_ms is None:
+            raise ValueError("Budget needs a simulation count, a time limit, or both.")
+        self.max_sims = sims
+        self.time_ms = time_ms
+        self.resolution_ms = resolution_ms
+        self.sims = 0
+        self.started = None
+        self.deadline = None
+        self.next_check = 1
+        self.expired = False
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.time_ms is not None:
+            self.deadline = self.started + self.time_ms / 1000
+        return self
+
+    def spend(self, n=1):
+        # Record n finished simulations
+        self.sims += n
+
+    def done(self):
+        # True once the simulation count or the deadline is reached
+        if self.max_sims is not None and self.sims >= self.max_sims:
+            return True
+        if self.deadline is None or self.sims < self.next_check:
+            return self.expired
+        if self.started is None:
+            self.start()
+        now = time.perf_counter()
+        if now >= self.deadline:
+            self.expired = True
+            return True
+        # Space the next clock read so it lands about resolution_ms from now
+        elapsed = now - self.started
+        rate = self.sims / elapsed if elapsed > 0 else 1.0
+        step = min(rate * self.resolution_ms / 1000, rate * (self.deadline - now))
+        self.next_check = self.sims + max(1, min(int(step), MAX_CHECK_INTERVAL))
+        return False
+
+    def remaining(self):
+        # Simulations left under the count limit (a large number if only time-limited)
+        if self.max_sims is None:
+            return MAX_CHECK_INTERVAL
+        return self.max_sims - self.sims
+
+
+def parse_param(text):
+    # CLI budget: "500" is a simulation count, "250ms" a time budget in milliseconds
+    text = text.strip().lower()
+    if text.endswith("ms"):
+        return None, float(text[:-2])
+    return int(text), None
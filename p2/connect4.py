@@ -1,12 +1,19 @@
 import sys
 import random
-import copy
-import math
 
-# Game constants
-ROWS = 6
-COLUMNS = 7
-EMPTY = 'O'
+from position import CONNECT, EMPTY, Position, other, random_playout
+from batch_rollout import batch_playouts
+import mcts
+import parallel
+from budget import Budget, parse_param
+from instrument import clock, timed_playout
+from tracing import Tracer, TRACE, DEBUG, INFO
+from solver import Solver, SOLVE_EMPTY
+from book import open_book
+from playout import playout_policy
+
+# Boards are lists of rows, top row first; their size is the board's own
+# (position.ROWS x position.COLUMNS for the standard game), and k pieces in a row win.
 
 # Read input file
 def read_input(filename):
@@ -14,7 +21,7 @@ def read_input(filename):
         lines = [line.strip() for line in f.readlines()]
         algorithm = lines[0]
         player = lines[1]
-        board = [list(line) for line in lines[2:2 + ROWS]]
+        board = [list(line) for line in lines[2:] if line]
     return algorithm, player, board
 
 # Print board
@@ -25,7 +32,7 @@ def print_board(board):
 # Get legal moves
 def legal_moves(board):
     # Get the columns where the top row is empty
-    return [col for col in range(COLUMNS) if board[0][col] == EMPTY]
+    return [col for col in range(len(board[0])) if board[0][col] == EMPTY]
 
 # Make a move
 def make_move(board, col, player):
@@ -33,41 +40,58 @@ def make_move(board, col, player):
     return board
 
 # Win checkers
-def horizontal_win_check(board, player):
+def horizontal_win_check(board, player, k=CONNECT):
     # Check horizontal win
-    for row in range(ROWS):
-        for col in range(COLUMNS - 3):
-            if all(board[row][col + i] == player for i in range(4)):
+    rows, columns = len(board), len(board[0])
+    for row in range(rows):
+        for col in range(columns - k + 1):
+            if all(board[row][col + i] == player for i in range(k)):
                 return True
     return False
 
-def vertical_win_check(board, player):
+def vertical_win_check(board, player, k=CONNECT):
     # Check vertical win
-    for col in range(COLUMNS):
-        for row in range(ROWS - 3):
-            if all(board[row + i][col] == player for i in range(4)):
+    rows, columns = len(board), len(board[0])
+    for col in range(columns):
+        for row in range(rows - k + 1):
+            if all(board[row + i][col] == player for i in range(k)):
                 return True
     return False
 
-def diagonal_win_check(board, player):
+def diagonal_win_check(board, player, k=CONNECT):
     # Check diagonal win (bottom-left to top-right and top-left to bottom-right)
-    for row in range(3, ROWS):
-        for col in range(COLUMNS - 3):
-            if all(board[row - i][col + i] == player for i in range(4)):
+    rows, columns = len(board), len(board[0])
+    for row in range(k - 1, rows):
+        for col in range(columns - k + 1):
+            if all(board[row - i][col + i] == player for i in range(k)):
                 return True
-    for row in range(ROWS - 3):
-        for col in range(COLUMNS - 3):
-            if all(board[row + i][col + i] == player for i in range(4)):
+    for row in range(rows - k + 1):
+        for col in range(columns - k + 1):
+            if all(board[row + i][col + i] == player for i in range(k)):
                 return True
     return False
 
-def check_win(board, player):
-    # Check for win conditions
-    return (
-        horizontal_win_check(board, player) or
-        vertical_win_check(board, player) or
-        diagonal_win_check(board, player)
-    )
+def check_win(board, player, k=CONNECT):
+    # Check for win conditions (shift-based test on the bitboard form of the board)
+    if isinstance(board, Position):
+        return board.is_win(player)
+    return Position.from_board(board, k).is_win(player)
+
+def check_win_at(board, row, col, player, k=CONNECT):
+    # Check only the four lines through (row, col), e.g. the piece just placed by do_move
+    if row is None:
+        return False
+    rows, columns = len(board), len(board[0])
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for sign in (1, -1):
+            r, c = row + sign * d_row, col + sign * d_col
+            while 0 <= r < rows and 0 <= c < columns and board[r][c] == player:
+                count += 1
+                r, c = r + sign * d_row, c + sign * d_col
+        if count >= k:
+            return True
+    return False
 
 # Update file after move
 def update_board_player(filename, algorithm, next_player, board):
@@ -82,7 +106,7 @@ def update_board_player(filename, algorithm, next_player, board):
 # Do/undo move functions (in-place board edits)
 def do_move(board, col, player):
     # Place the player's piece in the lowest available row in the column
-    for row in reversed(range(ROWS)):
+    for row in reversed(range(len(board))):
         if board[row][col] == EMPTY:
             board[row][col] = player
             return row  # return the row where the move was placed
@@ -93,337 +117,528 @@ def undo_move(board, col, row):
     if row is not None:
         board[row][col] = EMPTY
 
-def simulate_random_game_verbose(board, current_player, opponent, verbose):
-    # Simulate a random game from the current board state
+def make_tracer(verbose, trace):
+    # The engine's trace sink: the tracing.Tracer given, a full trace to stdout when verbose, else None
+    if trace is not None:
+        return trace
+    return Tracer(sys.stdout) if verbose else None
+
+
+def end_trace(tracer):
+    # Write out what an engine traced (a ring buffer is left for its owner to flush)
+    if tracer is not None and not tracer.ring:
+        tracer.flush()
+
+
+def simulate_random_game_verbose(board, current_player, opponent, verbose, trace=None, playout=None,
+                                 cutoff=None, k=CONNECT):
+    # Simulate a random game from the current board state (a Position or a list board).
+    # Moves and the result are traced (see tracing.Tracer) when verbose or a trace is given;
+    # a simulation the tracer does not sample runs as a plain fast playout.
+    # playout (a playout.PlayoutPolicy or its name) picks the moves instead of uniform chance.
+    # With a cutoff, a game still going after that many moves stops and returns the
+    # static evaluation (see evaluate.py) from current_player's side, between -1 and 1.
+    # A list board is played as k in a row.
+    pos = board if isinstance(board, Position) else Position.from_board(board, k)
+    playout = playout_policy(playout, cutoff)
+    tracer = make_tracer(verbose, trace)
+    if tracer is None or not tracer.wants(DEBUG):
+        if playout is not None:
+            return playout.playout(pos, current_player, opponent)
+        return random_playout(pos, current_player, opponent)
+
     turn = opponent
     moves_sequence = []
 
     while True:
+        if playout is not None and playout.cutoff is not None and len(moves_sequence) >= playout.cutoff:
+            red_score = playout.score(pos, turn)
+            result = 2 * red_score - 1 if current_player == 'R' else 1 - 2 * red_score
+            tracer.event(DEBUG, "CUTOFF NODE VALUE: %.2f", result)
+            break
+
         # Get the list of legal (non-full) columns
-        moves = legal_moves(board)
+        moves = pos.legal_moves()
 
         # If there are no legal moves left, it's a draw
         if not moves:
-            if verbose:
-                print("TERMINAL NODE VALUE: 0")
-            return 0
-        # Randomly select a move from the available legal moves
-        move = random.choice(moves)
+            tracer.event(DEBUG, "TERMINAL NODE VALUE: 0")
+            result = 0
+            break
+        # Randomly select a move from the available legal moves (or ask the playout policy)
+        move = random.choice(moves) if playout is None else playout.choose(pos, turn)
         moves_sequence.append(move)
+        tracer.event(TRACE, "Move selected: %d", move + 1)
 
-        if verbose:
-            print(f"Move selected: {move + 1}")
-
-        # Play the move and get the row where the token landed
-        row = do_move(board, move, turn)
-        if row is None:
-            continue  # Skip if move failed
-
-        if check_win(board, turn):
-            # Check if the current player has won
-            if verbose:
-                print(f"TERMINAL NODE VALUE: {'1' if turn == current_player else '-1'}")
-            undo_move(board, move, row)
-            return 1 if turn == current_player else -1
+        # Play the move and check if it completed a line for the current player
+        pos.play(move, turn)
+        if pos.wins_at(move):
+            result = 1 if turn == current_player else -1
+            tracer.event(DEBUG, "TERMINAL NODE VALUE: %d", result)
+            break
 
         turn = 'Y' if turn == 'R' else 'R'
 
+    # Restore the position the simulation started from
+    for move in reversed(moves_sequence):
+        pos.undo(move)
+    if trace is None:
+        tracer.flush()
+    return result
 
-def run_ur(board, player, param=None, verbose=True):
+
+def run_ur(board, player, param=None, verbose=True, search_stats=None, trace=None, k=CONNECT):
     # Run the UR algorithm
-    legal = legal_moves(board)
+    legal = Position.from_board(board, k).legal_moves()
+    tracer = make_tracer(verbose, trace)
 
     # If no legal moves, return the board unchanged and None as the move
     if not legal:
-        if verbose:
-            print("No legal moves available.")
+        if tracer is not None:
+            tracer.event(INFO, "No legal moves available.")
+            end_trace(tracer)
         return board, None
     
     # Randomly select one of the legal moves
     move = random.choice(legal)
-    if verbose:
-        print(f"FINAL Move selected: {move + 1}")
+    if tracer is not None:
+        tracer.event(INFO, "FINAL Move selected: %d", move + 1)
+        end_trace(tracer)
 
     # Apply the selected move to the board
     board = make_move(board, move, player)
+    if search_stats is not None:
+        search_stats.finish(move)
     return board, move
 
 
-def run_pmcgs(board, player, param, verbose):
-    # Run the PMCGS algorithm
-    legal = legal_moves(board)
+def run_pmcgs(board, player, param, verbose, batch=None, time_ms=None, budget=None, search_stats=None,
+              trace=None, solve_below=SOLVE_EMPTY, book=None, playout=None, cutoff=None, k=CONNECT):
+    # Run the PMCGS algorithm on the bitboard form of the board (k in a row to win).
+    # With batch=N the simulations for each move are played N at a time as NumPy arrays.
+    # With time_ms the columns are sampled round-robin until the deadline instead of
+    # `param` times each; pass a budget.Budget to read back how many simulations ran.
+    # search_stats (an instrument.SearchStats) gets rollout/backprop timings and counters.
+    # Diagnostics go to trace (a tracing.Tracer), or to stdout when verbose.
+    # Positions with at most solve_below empty cells are solved exactly instead (0 disables),
+    # and positions in the opening book (a book.OpeningBook) are played from it.
+    # playout (a playout.PlayoutPolicy or its name) replaces the uniform random
+    # simulations, and cutoff stops each one after that many moves with a static
+    # evaluation; batched simulations are always uniform and played to the end.
+    pos = Position.from_board(board, k)
+    legal = pos.legal_moves()
+    playout = playout_policy(playout, cutoff)
+    play_out = random_playout if playout is None else playout.playout
     # Initialize stats: wi = total win score, ni = number of simulations
     stats = {move: {"wi": 0, "ni": 0} for move in legal}
     opponent = 'Y' if player == 'R' else 'R'
-    if verbose:
-        print(f"Running PMCGS with {param} simulations per move.")
-        print(f"Legal moves: {legal}")
-
-    # Loop over each legal move to evaluate it
-    for move in legal:
-        ## Simulate the move and update stats
-        if verbose:
-            print(f"\nEvaluating move: {move + 1}")
-
-        # Perform 'param' number of random simulations for each move
-        for _ in range(param):
-            # Simulate the move
-            row = do_move(board, move, player)
-            if row is None:
-                continue  # Skip if move failed
-            if stats[move]["ni"] == 0 and verbose:
-                print("NODE ADDED\n")
-
-            # Simulate a full random game from this position
-            result = simulate_random_game_verbose(board, player, opponent, verbose)
-            undo_move(board, move, row)
-            # Update statistics: win result (+1, 0, -1)
+    if budget is None:
+        budget = Budget(None if param is None else param * len(legal), time_ms)
+    budget.start()
+    tracer = make_tracer(verbose, trace)
+    if tracer is not None:
+        if budget.time_ms is None:
+            tracer.event(INFO, "Running PMCGS with %d simulations per move.", param)
+        else:
+            tracer.event(INFO, "Running PMCGS for %g ms.", budget.time_ms)
+        tracer.event(INFO, "Legal moves: %s", legal)
+    solved = (play_book(board, pos, player, book, tracer, search_stats)
+              or play_solved(board, pos, player, endgame_solver(solve_below), tracer, search_stats))
+    if solved is not None:
+        return solved
+
+    def simulate(move, count):
+        # Run `count` simulations through move and update its stats
+        if search_stats is not None:
+            return timed_simulate(move, count)
+        pos.play(move, player)
+        if pos.wins_at(move):
+            # The move itself wins: every simulation through it is a win, no rollout needed
+            if tracer is not None:
+                tracer.event(DEBUG, "TERMINAL NODE VALUE: 1")
+            stats[move]["wi"] += count
+            stats[move]["ni"] += count
+        elif batch:
+            # Batched mode: the same random playouts, advanced in lockstep
+            outcomes = batch_playouts(pos, player, opponent, count)
+            stats[move]["wi"] += int(outcomes.sum())
+            stats[move]["ni"] += count
+        else:
+            for _ in range(count):
+                if tracer is None:
+                    # Simulate a full random game from this position
+                    result = play_out(pos, player, opponent)
+                    # Update statistics: win result (+1, 0, -1)
+                    stats[move]["wi"] += result
+                    stats[move]["ni"] += 1
+                    continue
+                tracer.begin()
+                if stats[move]["ni"] == 0:
+                    tracer.event(DEBUG, "NODE ADDED\n")
+                result = simulate_random_game_verbose(pos, player, opponent, False, tracer, playout)
+                stats[move]["wi"] += result
+                stats[move]["ni"] += 1
+                if tracer.wants(DEBUG):
+                    tracer.event(DEBUG, "Updated values:\nwi: %g\nni: %d \n", stats[move]["wi"], stats[move]["ni"])
+        pos.undo(move)
+        budget.spend(count)
+
+    def timed_simulate(move, count):
+        # simulate() with its phases timed into search_stats
+        pos.play(move, player)
+        won = pos.wins_at(move)
+        for _ in range(1 if batch or won else count):
+            start = clock()
+            if won:
+                result, n = count, count
+            elif batch:
+                result, n = int(batch_playouts(pos, player, opponent, count).sum()), count
+            elif tracer is not None:
+                tracer.begin()
+                result, n = simulate_random_game_verbose(pos, player, opponent, False, tracer, playout), 1
+            elif playout is not None:
+                result, n = playout.playout(pos, player, opponent), 1
+            else:
+                result, n = timed_playout(pos, player, opponent, search_stats), 1
+            middle = clock()
+            search_stats.add("rollout", middle - start)
             stats[move]["wi"] += result
-            stats[move]["ni"] += 1
-            if verbose:
-                print("Updated values:")
-                print(f"wi: {stats[move]['wi']}")
-                print(f"ni: {stats[move]['ni']} \n")
-    # After all simulations, choose the move with the highest total win score
-    best_move = max(legal, key=lambda m: stats[m]["wi"])
-
-    if verbose:
-        print("\nColumn values (wi/ni):")
-        for col in range(7):
+            stats[move]["ni"] += n
+            search_stats.add("backprop", clock() - middle)
+            search_stats.count("simulations", n)
+        pos.undo(move)
+        budget.spend(count)
+
+    if budget.time_ms is None:
+        # Loop over each legal move and perform 'param' simulations for it
+        for move in legal:
+            if tracer is not None:
+                tracer.event(INFO, "\nEvaluating move: %d", move + 1)
+            done = 0
+            while done < param:
+                size = min(batch or param, param - done)
+                simulate(move, size)
+                done += size
+    else:
+        # Anytime mode: one simulation (or batch) per column per round until time runs out
+        while not budget.done():
+            for move in legal:
+                simulate(move, min(batch or 1, budget.remaining()))
+                if budget.done():
+                    break
+
+    # After all simulations, choose the move with the highest average win score
+    # (the same as the highest total when every column got `param` simulations)
+    best_move = max(legal, key=lambda m: stats[m]["wi"] / stats[m]["ni"] if stats[m]["ni"] else -2)
+
+    if tracer is not None:
+        tracer.event(INFO, "\nColumn values (wi/ni):")
+        for col in range(pos.geo.columns):
             if col in stats and stats[col]["ni"] > 0:
                 avg = stats[col]["wi"] / stats[col]["ni"]
-                print(f"Column {col + 1}: {avg:.2f}")
+                tracer.event(INFO, "Column %d: %.2f", col + 1, avg)
             else:
-                print(f"Column {col + 1}: Null")
-        print(f"\nFINAL Move selected: {best_move + 1}")
+                tracer.event(INFO, "Column %d: Null", col + 1)
+        tracer.event(INFO, "Simulations run: %d", budget.sims)
+        tracer.event(INFO, "\nFINAL Move selected: %d", best_move + 1)
+        end_trace(tracer)
+    if search_stats is not None:
+        # Mean scores (-1 to 1) as win rates (0 to 1, a draw counting half), like the tree engines
+        search_stats.finish(best_move, [(stats[col]["wi"] / stats[col]["ni"] + 1) / 2
+                                        if col in stats and stats[col]["ni"] else None
+                                        for col in range(pos.geo.columns)])
     return make_move(board, best_move, player), best_move
 
-def run_uct(board, player, param, verbose):
-    # Run the UCT algorithm
-    legal = legal_moves(board)
 
-    # Initialize statistics for each legal move
-    stats = {move: {"wins": 0, "plays": 0} for move in legal}
-    opponent = 'Y' if player == 'R' else 'R'
-    C = math.sqrt(2)# UCT exploration constant
-    if verbose:
-        print(f"Running UCT with {param} simulations total.")
-        print(f"Legal moves: {legal}")
-    for sim in range(param):
-        # Calculate UCB scores for each legal move
-        total_plays = sum(stats[move]["plays"] for move in legal) + 1
-        ucb_scores = {}
-        for move in legal:
-            # Calculate UCB score for each move
-            w = stats[move]["wins"]
-            n = stats[move]["plays"]
-            ucb_scores[move] = float("inf") if n == 0 else (w / n) + C * math.sqrt(math.log(total_plays) / n)
-
-        # Select the move with the highest (or lowest, depending on player) UCB score
-        best_move = max(legal, key=lambda m: ucb_scores[m]) if player == 'R' else min(legal, key=lambda m: ucb_scores[m])
-        # Perform the move and simulate the game
-        if verbose:
-            print(f"\nwi: {stats[best_move]['wins']}")
-            print(f"ni: {stats[best_move]['plays']}")
-            for i in range(7):
-                if i in stats:
-                    w, n = stats[i]["wins"], stats[i]["plays"]
-                    v = (w / n) if n > 0 else 0.0
-                    print(f"V{i+1}: {v:.2f}" if i in legal else f"V{i+1}: Null")
-                else:
-                    print(f"V{i+1}: Null")
-            print(f"Move selected: {best_move + 1}")
-        #Apply the selected move
-        row = do_move(board, best_move, player)
-        if row is None:
-            continue  # Skip if move failed
-        # Simulate a random game from this state
-        winner = simulate_random_game_verbose(board, player, opponent, verbose)
-        undo_move(board, best_move, row)
-        #Update statistics
-        stats[best_move]["plays"] += 1
-        if winner == player:
-            # Update win count for the best move
-            stats[best_move]["wins"] += 1
-        if verbose:
-            print("Updated values:")
-            print(f"wi: {stats[best_move]['wins']}")
-            print(f"ni: {stats[best_move]['plays']}")
-    # After all simulations, determine the move with the best win rate
-    final_move = None
-    best_value = float('-inf') if player == 'R' else float('inf')
-    for move in legal:
-        # Calculate win rate for each move
-        w, n = stats[move]["wins"], stats[move]["plays"]
-        value = w / n if n > 0 else 0.0
-        if (player == 'R' and value > best_value) or (player == 'Y' and value < best_value):
-            best_value = value
-            final_move = move
-    if verbose:
-        for i in range(7):
-            if i in stats:
-                w, n = stats[i]["wins"], stats[i]["plays"]
-                v = w / n if n > 0 else 0.0
-                print(f"Column {i+1}: {v:.2f}")
+def play_book(board, pos, player, book, tracer, search_stats=None):
+    # Play the opening book's move for pos, if it has one (book is a book.OpeningBook).
+    # Returns (board, move) like the engines, or None to search as usual.
+    move = book.lookup(pos) if book is not None else None
+    if move is None or not pos.can_play(move):
+        return None
+    if tracer is not None:
+        tracer.event(INFO, "Book move: %d", move + 1)
+        tracer.event(INFO, "FINAL Move selected: %d", move + 1)
+        end_trace(tracer)
+    if search_stats is not None:
+        search_stats.finish(move)
+    return make_move(board, move, player), move
+
+
+def endgame_solver(solve_below, tt=None):
+    # A solver.Solver for positions with at most solve_below empty cells, or None if disabled
+    return Solver(tt, solve_below) if solve_below else None
+
+
+def play_solved(board, pos, player, solver, tracer, search_stats=None):
+    # Play the solver's exact move if pos is small enough and solved within its node limit.
+    # Returns (board, move) like the engines, or None to search as usual.
+    if solver is None or not solver.applies(pos):
+        return None
+    result = solver.solve(pos, player)
+    if search_stats is not None:
+        search_stats.count("solver_nodes", solver.nodes)
+    if result is None or result[1] is None:
+        if tracer is not None:
+            tracer.event(INFO, "Solver gave up after %d positions.", solver.nodes)
+        return None
+    value, move = result
+    if tracer is not None:
+        outcome = "win" if value > 0 else "loss" if value < 0 else "draw"
+        tracer.event(INFO, "Solved: %s (%d positions searched)", outcome, solver.nodes)
+        tracer.event(INFO, "FINAL Move selected: %d", move + 1)
+        end_trace(tracer)
+    if search_stats is not None:
+        # Proven value as a win rate: 1 win, 0.5 draw, 0 loss
+        search_stats.finish(move, [(value + 1) / 2 if col == move else None
+                                   for col in range(pos.geo.columns)])
+    return make_move(board, move, player), move
+
+
+def column_values(root):
+    # Win rate of each root child, None for columns not searched
+    values = []
+    for col in range(root.store.columns):
+        child = root.child(col)
+        values.append(child.wins / child.visits if child is not None and child.visits else None)
+    return values
+
+
+def trace_column_values(tracer, root, label="Column ", level=INFO):
+    # Trace the win rate of each root child, or Null for columns not searched
+    for col in range(root.store.columns):
+        child = root.child(col)
+        if child is not None and child.visits > 0:
+            tracer.event(level, "%s%d: %.2f", label, col + 1, child.wins / child.visits)
+        else:
+            tracer.event(level, "%s%d: Null", label, col + 1)
+
+
+def traced_rollout(player, tracer, playout=None):
+    # Random (or playout policy) playout that traces every move (values from player's side),
+    # for mcts.search
+    def rollout(pos, turn):
+        tracer.begin()
+        result = simulate_random_game_verbose(pos, player, turn, False, tracer, playout)
+        if isinstance(result, float):
+            # Cut off: pass the evaluation on as R's score
+            return (1 + result) / 2 if player == 'R' else (1 - result) / 2, None
+        return (player if result == 1 else other(player) if result == -1 else None), None
+    return rollout
+
+
+def run_root_parallel(board, pos, player, budget, tracer, policy, pool, search_stats=None, playout=None):
+    # Search with a parallel.RootParallel pool and play the merged choice
+    merged = pool.search(pos, player, budget.max_sims, policy, budget.time_ms, playout)
+    budget.spend(sum(stats[1] for stats in merged.values()))
+    final_move = parallel.best_move(merged)
+    if tracer is not None:
+        tracer.event(INFO, "Root-parallel search on %d workers, %d simulations.", pool.workers, budget.sims)
+        for col in range(pos.geo.columns):
+            if col in merged and merged[col][1] > 0:
+                tracer.event(INFO, "Column %d: %.2f", col + 1, merged[col][0] / merged[col][1])
             else:
-                print(f"Column {i+1}: Null")
-        print(f"FINAL Move selected: {final_move + 1}")
+                tracer.event(INFO, "Column %d: Null", col + 1)
+        tracer.event(INFO, "FINAL Move selected: %d", final_move + 1)
+        end_trace(tracer)
+    if search_stats is not None:
+        search_stats.count("simulations", budget.sims)
+        search_stats.finish(final_move, [merged[col][0] / merged[col][1]
+                                         if col in merged and merged[col][1] else None
+                                         for col in range(pos.geo.columns)])
     return make_move(board, final_move, player), final_move
 
 
-def run_uct_rave(board, player, param, verbose):
-    legal = legal_moves(board)
-    # UCT stats: tracks win/play counts per move
-    stats = {move: {"wins": 0, "plays": 0} for move in legal}
-    # RAVE stats: global statistics updated for all moves seen in rollouts
-    rave_stats = {move: {"wins": 0, "plays": 0} for move in legal}
-    opponent = 'Y' if player == 'R' else 'R'
-    C = math.sqrt(2)
-    beta_const = 300  # Controls RAVE influence
-
-    preferred_columns = [3, 2, 4, 1, 5, 0, 6]  # center-favoring heuristic
-
-    def rollout(sim_board, turn):
-        """
-        Run a rollout simulation using center-biased move selection on a copied board.
-        Returns result (+1, -1, or 0) and move history for RAVE updates.
-        """
-        move_history = []
-        max_steps = ROWS * COLUMNS
-        for _ in range(max_steps):
-            moves = legal_moves(sim_board)
-            if not moves:
-                return 0, move_history  # Draw
-            # Prefer center columns if available, else random
-            move = next((m for m in preferred_columns if m in moves), random.choice(moves))
-            row = do_move(sim_board, move, turn)
-            move_history.append((move, row))
-            # If current turn player wins, return result
-            if check_win(sim_board, turn):
-                return 1 if turn == player else -1, move_history
-            turn = 'Y' if turn == 'R' else 'R'
-        return 0, move_history # Draw if no winner after max moves
-
-    for sim in range(param):
-        total_plays = sum(stats[m]["plays"] for m in legal) + 1
-
-        ucb_scores = {}
-        #Calculate combined UCT-RAVE score for each move
+def run_uct(board, player, param, verbose, batch=None, tree=None, tt=None, pool=None, threads=None,
+            time_ms=None, budget=None, search_stats=None, trace=None, solve_below=SOLVE_EMPTY,
+            book=None, playout=None, cutoff=None, k=CONNECT):
+    # Run the UCT algorithm: a multi-level search tree over the bitboard position (k in a row to win).
+    # With batch=N each new leaf gets N playouts at once (NumPy mini-batch).
+    # Passing the same mcts.SearchTree on every call reuses the subtree of the move played,
+    # and a transposition.TranspositionTable merges statistics across move orders.
+    # With a parallel.RootParallel pool the budget is split across its worker processes;
+    # with threads=N, N threads share one tree (free-threaded builds only, see mcts).
+    # time_ms searches until a deadline instead of (or as well as) `param` simulations.
+    # search_stats (an instrument.SearchStats) collects per-phase timings and counters.
+    # Diagnostics go to trace (a tracing.Tracer), or to stdout when verbose.
+    # Positions with at most solve_below empty cells are solved exactly (0 disables), and
+    # tree nodes that small carry their proven result instead of being simulated.
+    # Positions in the opening book (a book.OpeningBook) are played from it without a search.
+    # playout (a playout.PlayoutPolicy or its name) replaces the uniform random rollouts,
+    # and cutoff stops each rollout after that many moves with a static evaluation.
+    pos = Position.from_board(board, k)
+    budget = budget or Budget(param, time_ms)
+    playout = playout_policy(playout, cutoff)
+    tracer = make_tracer(verbose, trace)
+    if tracer is not None:
+        if budget.time_ms is None:
+            tracer.event(INFO, "Running UCT with %d simulations total.", param)
+        else:
+            tracer.event(INFO, "Running UCT for %g ms.", budget.time_ms)
+        tracer.event(INFO, "Legal moves: %s", pos.legal_moves())
+    solver = endgame_solver(solve_below, tt)
+    solved = (play_book(board, pos, player, book, tracer, search_stats)
+              or play_solved(board, pos, player, solver, tracer, search_stats))
+    if solved is not None:
+        return solved
+    if pool is not None:
+        return run_root_parallel(board, pos, player, budget, tracer, "uct", pool, search_stats, playout)
+    if threads and threads > 1:
+        root = mcts.tree_parallel_search(pos, player, budget, "uct", tree, threads, tt=tt,
+                                         stats=search_stats,
+                                         rollout=playout.rollout if playout is not None else None)
+        final_move = mcts.best_child(root).move
+        if tracer is not None:
+            trace_column_values(tracer, root)
+            tracer.event(INFO, "Simulations run: %d", budget.sims)
+            tracer.event(INFO, "FINAL Move selected: %d", final_move + 1)
+            end_trace(tracer)
+        if search_stats is not None:
+            search_stats.finish(final_move, column_values(root))
+        return make_move(board, final_move, player), final_move
+
+    def on_simulation(sim, root, move):
+        # Trace the root statistics of the column this simulation went through
+        if not tracer.wants(DEBUG):
+            return
+        child = root.child(move)
+        tracer.event(DEBUG, "Move selected: %d", move + 1)
+        tracer.event(DEBUG, "Updated values:\nwi: %s\nni: %d", child.wins, child.visits)
+        trace_column_values(tracer, root, "V", DEBUG)
+
+    traced = tracer is not None and not batch
+    if traced:
+        rollout = traced_rollout(player, tracer, playout)
+    else:
+        rollout = playout.rollout if playout is not None else None
+    root = mcts.search(pos, player, budget, "uct", tree, rollout=rollout, batch=batch,
+                       on_simulation=on_simulation if traced else None, tt=tt, stats=search_stats,
+                       solver=solver)
+    final_move = mcts.best_child(root).move
+    if tracer is not None:
+        trace_column_values(tracer, root)
+        tracer.event(INFO, "Simulations run: %d", budget.sims)
+        tracer.event(INFO, "FINAL Move selected: %d", final_move + 1)
+        end_trace(tracer)
+    if search_stats is not None:
+        search_stats.finish(final_move, column_values(root))
+    return make_move(board, final_move, player), final_move
 
-        for move in legal:
-            wi = stats[move]["wins"]
-            ni = stats[move]["plays"]
-            wi_rave = rave_stats[move]["wins"]
-            ni_rave = rave_stats[move]["plays"]
-            # Weighting factor to interpolate between UCT and RAVE
-            beta = ni_rave / (ni + ni_rave + beta_const)
-            # UCT win rate estimate
-            v_uct = (wi / ni) if ni > 0 else 0
-            # RAVE win rate estimate
-            v_rave = (wi_rave / ni_rave) if ni_rave > 0 else 0
-            # UCT-RAVE combined score
-            ucb_scores[move] = (1 - beta) * v_uct + beta * v_rave + C * math.sqrt(math.log(total_plays) / (ni + 1e-6))
-
-        # Choose best move based on combined score
-        best_move = max(ucb_scores, key=ucb_scores.get)
-        row = do_move(board, best_move, player)
-        if row is None:
-            continue  # Skip illegal moves
-
-        # Run simulation on a separate copy of the board
-        sim_board = [r[:] for r in board]
-        result, move_history = rollout(sim_board, opponent)
-
-        undo_move(board, best_move, row)  # Only undo root move
-
-        stats[best_move]["plays"] += 1
-        if result == 1:
-            stats[best_move]["wins"] += 1
-
-        # Update RAVE stats for all moves seen in rollout
-        for m, _ in move_history:
-            if m in rave_stats:
-                rave_stats[m]["plays"] += 1
-                if result == 1:
-                    rave_stats[m]["wins"] += 1
-
-        # Print progress update every 100 simulations
-        if verbose and (sim + 1) % 100 == 0:
-            print(f"Simulation {sim + 1}/{param} complete")
-
-    # Select final move based on win rate
-    final_move = max(legal, key=lambda m: stats[m]["wins"] / stats[m]["plays"] if stats[m]["plays"] > 0 else -1)
 
-    if verbose:
-        print("\nFinal move stats:")
-        for move in range(COLUMNS):
-            if move in stats and stats[move]["plays"] > 0:
-                v = stats[move]["wins"] / stats[move]["plays"]
-                print(f"Column {move + 1}: {v:.2f}")
-            else:
-                print(f"Column {move + 1}: Null")
-        print(f"FINAL Move selected: {final_move + 1}")
+def run_uct_rave(board, player, param, verbose, tree=None, tt=None, pool=None, time_ms=None, budget=None,
+                 search_stats=None, trace=None, solve_below=SOLVE_EMPTY, book=None, playout=None,
+                 cutoff=None, k=CONNECT):
+    # UCT with RAVE: every tree node also keeps all-moves-as-first statistics,
+    # updated for each move its player makes later in the simulation.
+    # Rollouts are center-first unless playout (a playout.PlayoutPolicy or its name) is given;
+    # cutoff stops each one after that many moves with a static evaluation.
+    pos = Position.from_board(board, k)
+    budget = budget or Budget(param, time_ms)
+    playout = playout_policy(playout, cutoff, "center")
+    tracer = make_tracer(verbose, trace)
+    solver = endgame_solver(solve_below, tt)
+    solved = (play_book(board, pos, player, book, tracer, search_stats)
+              or play_solved(board, pos, player, solver, tracer, search_stats))
+    if solved is not None:
+        return solved
+    if pool is not None:
+        return run_root_parallel(board, pos, player, budget, tracer, "rave", pool, search_stats, playout)
+
+    def on_simulation(sim, root, move):
+        # Trace a progress update every 100 simulations
+        if sim % 100 == 0:
+            tracer.event(INFO, "Simulation %d/%s complete", sim, param or "-")
+
+    root = mcts.search(pos, player, budget, "rave", tree,
+                       rollout=playout.amaf_rollout if playout is not None else None,
+                       on_simulation=on_simulation if tracer is not None else None, tt=tt,
+                       stats=search_stats, solver=solver)
+    final_move = mcts.best_child(root).move
+
+    if tracer is not None:
+        tracer.event(INFO, "\nFinal move stats:")
+        trace_column_values(tracer, root)
+        tracer.event(INFO, "Simulations run: %d", budget.sims)
+        tracer.event(INFO, "FINAL Move selected: %d", final_move + 1)
+        end_trace(tracer)
+    if search_stats is not None:
+        search_stats.finish(final_move, column_values(root))
 
     return make_move(board, final_move, player), final_move
 
 
-
-def run_uct_pb(board, player, param, verbose):
-    legal = legal_moves(board)
-    # Initialize win and play statistics for each move
-    stats = {move: {"wins": 0, "plays": 0} for move in legal}
-    opponent = 'Y' if player == 'R' else 'R'
-    C = math.sqrt(2)
-
-    # Define a simple heuristic: bias toward center column (index 3)
-    def heuristic(col):
-        # Favor central columns (index 3 is center in 0-based indexing)
-        return 1 - abs(3 - col) / 3  # range [0, 1]
-
-    # Run the specified number of simulations
-    for sim in range(param):
-        total_plays = sum(stats[m]["plays"] for m in legal) + 1
-        ucb_scores = {}
-        # Compute UCB score + positional bias for each move
-        for move in legal:
-            w = stats[move]["wins"]
-            n = stats[move]["plays"]
-            # UCB formula: average win rate + exploration term
-            ucb = (w / n if n > 0 else 0) + C * math.sqrt(math.log(total_plays) / (n + 1e-6))
-            # Add positional bias (favoring center) scaled by a small factor (0.1)
-            bias = heuristic(move)
-            ucb_scores[move] = ucb + 0.1 * bias  # 0.1 is bias weight
-
-        # Select the move with the highest combined UCB + bias score
-        best_move = max(ucb_scores, key=ucb_scores.get)
-        # Apply the move to the board
-        row = do_move(board, best_move, player)
-        if row is None:
-            continue
-
-        # Simulate a random game starting from the new state
-        winner = simulate_random_game_verbose(board, player, opponent, verbose=False)
-        undo_move(board, best_move, row)
-        # Update statistics for the selected move
-        stats[best_move]["plays"] += 1
-        if winner == player:
-            stats[best_move]["wins"] += 1
-    # After simulations, choose the move with the highest average win rate
-    final_move = max(legal, key=lambda m: stats[m]["wins"] / stats[m]["plays"] if stats[m]["plays"] > 0 else 0)
-    if verbose:
-        print(f"\nUCT-PB Move selected: {final_move + 1}")
+def run_uct_pb(board, player, param, verbose, tree=None, time_ms=None, budget=None, search_stats=None,
+               trace=None, solve_below=SOLVE_EMPTY, book=None, playout=None, cutoff=None, k=CONNECT):
+    # UCT with a progressive bias toward the center columns (see mcts.pb_score)
+    # playout (a playout.PlayoutPolicy or its name) replaces the uniform random rollouts,
+    # and cutoff stops each rollout after that many moves with a static evaluation.
+    pos = Position.from_board(board, k)
+    budget = budget or Budget(param, time_ms)
+    playout = playout_policy(playout, cutoff)
+    tracer = make_tracer(verbose, trace)
+    solver = endgame_solver(solve_below)
+    solved = (play_book(board, pos, player, book, tracer, search_stats)
+              or play_solved(board, pos, player, solver, tracer, search_stats))
+    if solved is not None:
+        return solved
+    root = mcts.search(pos, player, budget, "pb", tree, rollout=playout.rollout if playout is not None else None,
+                       stats=search_stats, solver=solver)
+    final_move = mcts.best_child(root).move
+    if tracer is not None:
+        tracer.event(INFO, "\nUCT-PB Move selected: %d (%d simulations)", final_move + 1, budget.sims)
+        end_trace(tracer)
+    if search_stats is not None:
+        search_stats.finish(final_move, column_values(root))
     return make_move(board, final_move, player), final_move
 
 
+# Engines that accept a persistent mcts.SearchTree through their `tree` argument
+TREE_ENGINES = (run_uct, run_uct_rave, run_uct_pb)
+# Engines that accept a parallel.RootParallel through their `pool` argument
+POOL_ENGINES = (run_uct, run_uct_rave)
+# Engines that accept a wall-clock budget through their `time_ms` argument
+TIMED_ENGINES = (run_pmcgs, run_uct, run_uct_rave, run_uct_pb)
+# Engines that accept a transposition.TranspositionTable through their `tt` argument
+TT_ENGINES = (run_uct, run_uct_rave)
+# Engines that consult a book.OpeningBook passed as their `book` argument
+BOOK_ENGINES = (run_pmcgs, run_uct, run_uct_rave, run_uct_pb)
+# Engines whose simulations follow a playout.PlayoutPolicy passed as their `playout` argument
+PLAYOUT_ENGINES = (run_pmcgs, run_uct, run_uct_rave, run_uct_pb)
+# Searching engines by the algorithm names used in input files
+ENGINES = {"PMCGS": run_pmcgs, "UCT": run_uct, "UCT-RAVE": run_uct_rave, "UCT-PB": run_uct_pb}
+# Every engine by its algorithm name
+ALGORITHMS = dict(ENGINES, UR=run_ur)
+# Child score used by each tree engine, for searching its tree between moves (see ponder.py)
+TREE_POLICIES = {run_uct: "uct", run_uct_rave: "rave", run_uct_pb: "pb"}
+
+
+def engine_options(alg, time_ms=None, tree=None, pool=None, book=None, playout=None, k=CONNECT):
+    # Keyword arguments for engine alg, from whichever of these it supports (pool before tree)
+    options = {} if k == CONNECT else {"k": k}
+    if playout is not None and alg in PLAYOUT_ENGINES:
+        options["playout"] = playout
+    if time_ms is not None and alg in TIMED_ENGINES:
+        options["time_ms"] = time_ms
+    if pool is not None and alg in POOL_ENGINES:
+        options["pool"] = pool
+    elif tree is not None and alg in TREE_ENGINES:
+        options["tree"] = tree
+    if book is not None and alg in BOOK_ENGINES:
+        options["book"] = book
+    return options
+
+
 # --- Main program ---
 if __name__ == "__main__":
     if len(sys.argv) != 4:
-        print("Usage: python part1Algo2.py <filename> <verbose> <param>")
+        print("Usage: python connect4.py <filename> <verbose> <param>")
+        print("  <param> is a simulation count, or a time budget such as 250ms")
         sys.exit(1)
 
     filename = sys.argv[1]
     verbose = sys.argv[2].lower() == "true"
-    param = int(sys.argv[3])
+    # A time budget replaces the simulation count for the searching engines
+    param, time_ms = parse_param(sys.argv[3])
 
     algorithm, player, board = read_input(filename)
 
@@ -435,7 +650,7 @@ if __name__ == "__main__":
     if verbose:
         print(f"Algorithm: {algorithm}")
         print(f"Player: {player}")
-        print(f"Param: {param}")
+        print(f"Param: {sys.argv[3]}")
         print("Current board:")
         print_board(board)
         print("Legal moves:", legal_moves(board))
@@ -445,13 +660,13 @@ if __name__ == "__main__":
     if algorithm == "UR":
         board, move = run_ur(board, player, param, verbose)
     elif algorithm == "PMCGS":
-        board, move = run_pmcgs(board, player, param, verbose)
+        board, move = run_pmcgs(board, player, param, verbose, time_ms=time_ms, book=open_book())
     elif algorithm == "UCT":
-        board, move = run_uct(board, player, param, verbose)
+        board, move = run_uct(board, player, param, verbose, time_ms=time_ms, book=open_book())
     elif algorithm == "UCT-RAVE":
-        board, move = run_uct_rave(board, player, param, verbose)
+        board, move = run_uct_rave(board, player, param, verbose, time_ms=time_ms, book=open_book())
     elif algorithm == "UCT-PB":
-        board, move = run_uct_pb(board, player, param, verbose)
+        board, move = run_uct_pb(board, player, param, verbose, time_ms=time_ms, book=open_book())
     else:
         print(f"Unknown algorithm: {algorithm}")
         sys.exit(1)
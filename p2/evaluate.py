@@ -0,0 +1,75 @@
+import math
+
+# Static evaluation: open windows (k-cell lines the opponent has no piece in)
+# holding k - 1 or k - 2 of a player's pieces, counted for every window at once with
+# shifts of the bitboards. Used where a rollout is cut off before the game ends.
+
+THREE_WEIGHT = 1.0
+TWO_WEIGHT = 0.25
+EVAL_SCALE = 0.5  # slope of the squashing tanh; the evaluation stays inside (-1, 1)
+
+
+def open_windows(bits, occupied, geo):
+    # (open threes, open twos) for the player with mask bits, i.e. windows one and two
+    # pieces short of k. A window is named by its lowest cell: bit i of a mask stands
+    # for the window of cells i, i+s, ..., i+(k-1)s.
+    free = (bits | ~occupied) & geo.board_mask  # own pieces and empty cells
+    k = geo.k
+    threes = twos = 0
+    for shift in geo.directions:
+        if k != 4:
+            window = free
+            for i in range(1, k):
+                window &= free >> i * shift
+            if window:
+                planes = count_planes([bits >> i * shift for i in range(k)])
+                threes += (window & equal_to(planes, k - 1)).bit_count()
+                twos += (window & equal_to(planes, k - 2)).bit_count()
+            continue
+        window = free & (free >> shift) & (free >> 2 * shift) & (free >> 3 * shift)
+        if not window:
+            continue
+        # Bit-sliced count of the own pieces in each window: a + b + c + d
+        a, b, c, d = bits, bits >> shift, bits >> 2 * shift, bits >> 3 * shift
+        low, high = a ^ b, a & b
+        low2, high2 = c ^ d, c & d
+        odd = low ^ low2
+        one_pair = high ^ high2 ^ (low & low2)  # the count is 2 or 3
+        threes += (window & odd & one_pair).bit_count()
+        twos += (window & ~odd & one_pair).bit_count()
+    return threes, twos
+
+
+def count_planes(masks):
+    # Bit-sliced sum of the masks: planes[j] holds bit j of each position's count
+    planes = []
+    for carry in masks:
+        for j, plane in enumerate(planes):
+            planes[j] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+def equal_to(planes, n):
+    # Positions whose bit-sliced count is n
+    if n < 0 or n >> len(planes):
+        return 0
+    mask = -1
+    for j, plane in enumerate(planes):
+        mask &= plane if n >> j & 1 else ~plane
+    return mask
+
+
+def evaluate(pos, player):
+    # Heuristic value of pos for player, in (-1, 1); 0 is even
+    red, yellow = pos.bits
+    occupied = red | yellow
+    red_threes, red_twos = open_windows(red, occupied, pos.geo)
+    yellow_threes, yellow_twos = open_windows(yellow, occupied, pos.geo)
+    score = THREE_WEIGHT * (red_threes - yellow_threes) + TWO_WEIGHT * (red_twos - yellow_twos)
+    value = math.tanh(EVAL_SCALE * score)
+    return value if player == 'R' else -value
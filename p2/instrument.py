@@ -0,0 +1,113 @@
+import json
+import random
+import time
+
+
+PHASES = ("selection", "expansion", "rollout", "win_detection", "backprop", "output")
+COUNTERS = ("simulations", "rollouts", "rollout_moves", "max_rollout", "nodes_created",
+            "nodes_pruned", "tt_hits", "tt_misses", "solver_nodes", "proven")
+
+clock = time.perf_counter
+
+
+class SearchStats:
+    """
+    Opt-in per-phase timers and counters for one engine call. Pass an
+    instance as the `stats` argument of a run_* engine; it is filled in
+    during the search and finish() stamps the chosen move, the value the
+    engine gave each column (None where it has none), and the total time.
+    Timers are in seconds. win_detection is the part of rollout and
+    expansion time spent in win checks. With jsonl set (a path or an open
+    file), finish() appends the stats as one JSON line.
+    Engines skip every timing call when no stats object is given.
+    """
+
+    def __init__(self, engine=None, jsonl=None):
+        self.engine = engine
+        self.jsonl = jsonl
+        self.timers = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.move = None
+        self.values = None
+        self.started = clock()
+        self.elapsed = 0.0
+
+    def add(self, phase, seconds):
+        self.timers[phase] += seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def rollout_done(self, moves):
+        counters = self.counters
+        counters["rollouts"] += 1
+        counters["rollout_moves"] += moves
+        if moves > counters["max_rollout"]:
+            counters["max_rollout"] = moves
+
+    def finish(self, move, values=None):
+        self.move = move
+        self.values = values
+        self.elapsed = clock() - self.started
+        if self.jsonl is not None:
+            self.emit(self.jsonl)
+        return self
+
+    def as_dict(self):
+        rollouts = self.counters["rollouts"]
+        return {
+            "engine": self.engine,
+            "move": self.move,
+            "values": self.values,
+            "elapsed": self.elapsed,
+            "timers": dict(self.timers),
+            "counters": dict(self.counters),
+            "mean_rollout": self.counters["rollout_moves"] / rollouts if rollouts else 0.0,
+        }
+
+    def emit(self, target):
+        # Append the stats as one JSON line to a path or an open text file
+        line = json.dumps(self.as_dict()) + "\n"
+        if hasattr(target, "write"):
+            target.write(line)
+        else:
+            with open(target, "a") as f:
+                f.write(line)
+
+
+def timed_playout(pos, current_player, turn, stats, rng=random):
+    # position.random_playout with its win checks timed and its length counted
+    heights = pos.heights
+    bits = pos.bits
+    geo = pos.geo
+    rows, h1, cell_windows = geo.rows, geo.h1, geo.cell_windows
+    columns = range(geo.columns)
+    played = []
+    result = 0
+    win_time = 0.0
+    while True:
+        moves = [col for col in columns if heights[col] < rows]
+        if not moves:
+            break
+        col = rng.choice(moves)
+        idx = turn != 'R'
+        index = col * h1 + heights[col]
+        mine = bits[idx] | (1 << index)
+        bits[idx] = mine
+        heights[col] += 1
+        played.append(col)
+        start = clock()
+        for window in cell_windows[index]:
+            if mine & window == window:
+                result = 1 if turn == current_player else -1
+                break
+        win_time += clock() - start
+        if result:
+            break
+        turn = 'Y' if turn == 'R' else 'R'
+    pos.moves += len(played)
+    for col in reversed(played):
+        pos.undo(col)
+    stats.add("win_detection", win_time)
+    stats.rollout_done(len(played))
+    return result
@@ -0,0 +1,706 @@
+import itertools
+import math
+import random
+import sys
+import threading
+from array import array
+
+from position import COLUMNS, other, random_playout
+from transposition import zobrist, zobrist_step, canonical
+from budget import Budget
+from instrument import clock, timed_playout
+
+C = math.sqrt(2)  # UCT exploration constant
+BETA_CONST = 300  # Controls RAVE influence
+BIAS_WEIGHT = 0.1  # Weight of the UCT-PB center bias
+LOCK_STRIPES = 64  # node locks shared by tree-parallel threads (power of two)
+MAX_NODES = 1 << 21  # default cap on the node slots of one tree
+PRUNE_FRACTION = 0.25  # share of the slots one pruning pass frees
+PROOF_RATE = 1  # solver nodes a search may spend proving tree nodes, per simulation run
+MASK_CODES = ('B', 'H', 'L', 'Q')  # unsigned array types for column bitmasks, narrowest first
+
+# Terminal state of a node as stored: none, won by 'R', won by 'Y', drawn
+TERMINALS = (None, 'R', 'Y', 'D')
+TERMINAL_CODES = {None: 0, 'R': 1, 'Y': 2, 'D': 3}
+
+
+class NodeStore:
+    """
+    Struct-of-arrays storage for search tree nodes: one typed array per
+    statistic, indexed by node number. A node's children live in a block of
+    `columns` consecutive slots, one per column, so child `col` of node i is
+    children[i] * columns + col and moves need no storage. `untried` and
+    `expanded` are bitmasks of the columns not yet and already expanded,
+    stored in the narrowest unsigned type that holds one bit per column.
+    The arrays grow as blocks are needed, up to max_nodes slots; past that,
+    prune() frees the subtrees with the fewest visits.
+    """
+
+    COLUMN_TYPES = (("visits", 'i'), ("wins", 'd'), ("rave_visits", 'i'), ("rave_wins", 'd'),
+                    ("children", 'i'), ("terminal", 'b'), ("untried", 'B'), ("expanded", 'B'))
+
+    def __init__(self, max_nodes=MAX_NODES, columns=COLUMNS):
+        mask_code = next((code for code in MASK_CODES if array(code).itemsize * 8 >= columns), None)
+        if mask_code is None:
+            raise ValueError(f"A node store holds at most {array(MASK_CODES[-1]).itemsize * 8} columns.")
+        self.columns = columns
+        self.column_types = tuple((name, mask_code if code == 'B' else code)
+                                  for name, code in self.COLUMN_TYPES)
+        self.max_blocks = max(2, max_nodes // columns)
+        self.capacity = 0  # blocks the arrays have room for
+        self.blocks = 0  # blocks handed out so far, free or not
+        self.free = []
+        for name, code in self.column_types:
+            setattr(self, name, array(code))
+        self._empty = {name: array(code, [-1 if name == "children" else 0]) * columns
+                       for name, code in self.column_types}
+        self.pruned = 0  # nodes dropped by prune()
+
+    def bytes_per_slot(self):
+        return sum(getattr(self, name).itemsize for name, _ in self.column_types)
+
+    def memory_bytes(self):
+        return self.capacity * self.columns * self.bytes_per_slot()
+
+    def full(self):
+        return not self.free and self.blocks >= self.max_blocks
+
+    def reset(self):
+        # Forget every node (the arrays keep their size)
+        self.blocks = 0
+        self.free = []
+
+    def alloc(self):
+        # A block of `columns` empty slots; returns its number, or -1 if the store is full
+        if self.free:
+            block = self.free.pop()
+        elif self.blocks < self.max_blocks:
+            if self.blocks == self.capacity:
+                self._grow()
+            block = self.blocks
+            self.blocks += 1
+        else:
+            return -1
+        start = block * self.columns
+        for name, empty in self._empty.items():
+            getattr(self, name)[start:start + self.columns] = empty
+        return block
+
+    def _grow(self):
+        # Double the arrays (within max_blocks) in place, so cached references stay valid
+        extra = min(self.max_blocks, max(64, self.capacity * 2)) - self.capacity
+        for name, _ in self.column_types:
+            column = getattr(self, name)
+            column.frombytes(bytes(column.itemsize * self.columns * extra))
+        self.capacity += extra
+
+    def inner_nodes(self, node):
+        # node and every node below it that has a block of children
+        found, stack = [], [node]
+        children, expanded, columns = self.children, self.expanded, self.columns
+        while stack:
+            node = stack.pop()
+            block = children[node]
+            if block < 0:
+                continue
+            found.append(node)
+            mask, base = expanded[node], block * columns
+            stack.extend(base + col for col in range(columns) if mask >> col & 1)
+        return found
+
+    def collapse(self, node):
+        # Free node's subtree and make node an unexpanded leaf again (it keeps its own
+        # statistics); returns the number of nodes dropped
+        inner = self.inner_nodes(node)
+        dropped = sum(bin(self.expanded[owner]).count("1") for owner in inner)
+        self.free.extend(self.children[owner] for owner in inner)
+        self.untried[node] |= self.expanded[node]
+        self.expanded[node] = 0
+        self.children[node] = -1
+        return dropped
+
+    def keep(self, root):
+        # Free every block outside root's subtree (root's own block stays)
+        live = bytearray(self.blocks)
+        live[root // self.columns] = 1
+        for owner in self.inner_nodes(root):
+            live[self.children[owner]] = 1
+        self.free = [block for block in range(self.blocks) if not live[block]]
+
+    def prune(self, root):
+        """
+        Collapse the inner nodes below root with the fewest visits until
+        PRUNE_FRACTION of the store is free. Returns the number of nodes dropped.
+        """
+        candidates = sorted((self.visits[node], node) for node in self.inner_nodes(root)[1:])
+        target = len(self.free) + max(1, int(self.max_blocks * PRUNE_FRACTION))
+        dropped, start, freed = 0, len(self.free), set()
+        for _, node in candidates:
+            if len(self.free) >= target:
+                break
+            if node // self.columns in freed:
+                continue  # inside a subtree this pass already dropped
+            dropped += self.collapse(node)
+            freed.update(self.free[start:])
+            start = len(self.free)
+        self.pruned += dropped
+        return dropped
+
+    def stats(self, root=None):
+        nodes = Node(self, root, None).size() if root is not None else None
+        used = (self.blocks - len(self.free)) * self.columns
+        return {
+            "nodes": nodes,
+            "slots": used,
+            "capacity": self.capacity * self.columns,
+            "bytes": self.memory_bytes(),
+            "bytes_per_slot": self.bytes_per_slot(),
+            "bytes_per_node": self.memory_bytes() / nodes if nodes else 0.0,
+            "pruned": self.pruned,
+        }
+
+
+class Node:
+    """
+    A view of one node in a NodeStore, for code outside the search loop.
+    `player` is the player who made `move` to reach this node, and `wins`
+    counts results from that player's side (a draw counts half).
+    """
+    __slots__ = ("store", "index", "player", "move")
+
+    def __init__(self, store, index, player, move=None):
+        self.store = store
+        self.index = index
+        self.player = player
+        self.move = move
+
+    @property
+    def visits(self):
+        return self.store.visits[self.index]
+
+    @property
+    def wins(self):
+        return self.store.wins[self.index]
+
+    @property
+    def rave_visits(self):
+        return self.store.rave_visits[self.index]
+
+    @property
+    def rave_wins(self):
+        return self.store.rave_wins[self.index]
+
+    @property
+    def terminal(self):
+        # Winner 'R'/'Y', 'D' for a draw, None if the game goes on
+        return TERMINALS[self.store.terminal[self.index]]
+
+    @property
+    def untried(self):
+        mask = self.store.untried[self.index]
+        return [col for col in range(self.store.columns) if mask >> col & 1]
+
+    @property
+    def children(self):
+        store, index = self.store, self.index
+        block, mask = store.children[index], store.expanded[index]
+        if block < 0:
+            return []
+        player = other(self.player)
+        columns = store.columns
+        return [Node(store, block * columns + col, player, col) for col in range(columns) if mask >> col & 1]
+
+    def child(self, move):
+        for child in self.children:
+            if child.move == move:
+                return child
+        return None
+
+    def size(self):
+        # Number of nodes in this subtree
+        store = self.store
+        return 1 + sum(bin(store.expanded[owner]).count("1") for owner in store.inner_nodes(self.index))
+
+
+def center_bias(col, columns=COLUMNS):
+    # Favor central columns (index 3 is center on the standard board), range [0, 1]
+    center = (columns - 1) / 2
+    return 1 - abs(center - col) / center if center else 1.0
+
+
+# Child scores take the child's mean value q separately, so it can come from
+# the node itself or from a transposition table entry shared by other paths.
+# `child` is a node number in `store`.
+def uct_score(store, child, q, log_total):
+    return q + C * math.sqrt(log_total / store.visits[child])
+
+
+def pb_score(store, child, q, log_total):
+    return uct_score(store, child, q, log_total) + BIAS_WEIGHT * center_bias(child % store.columns, store.columns)
+
+
+def rave_score(store, child, q, log_total):
+    n, n_rave = store.visits[child], store.rave_visits[child]
+    beta = n_rave / (n + n_rave + BETA_CONST)
+    v_rave = store.rave_wins[child] / n_rave if n_rave > 0 else 0
+    return (1 - beta) * q + beta * v_rave + C * math.sqrt(log_total / n)
+
+
+SCORES = {"uct": uct_score, "pb": pb_score, "rave": rave_score}
+
+
+def random_rollout(pos, turn):
+    # Uniform random playout; returns the winner ('R'/'Y') or None for a draw
+    result = random_playout(pos, 'R', turn)
+    return 'R' if result == 1 else 'Y' if result == -1 else None, None
+
+
+def timed_rollout(stats):
+    # random_rollout that records rollout length and win-check time in stats
+    def rollout(pos, turn):
+        result = timed_playout(pos, 'R', turn, stats)
+        return 'R' if result == 1 else 'Y' if result == -1 else None, None
+    return rollout
+
+
+def center_rollout(pos, turn):
+    # Center-first playout used by UCT-RAVE; also returns the (col, player) moves for AMAF
+    history = []
+    winner = None
+    while True:
+        move = next((m for m in pos.geo.center_order if pos.can_play(m)), None)
+        if move is None:
+            break
+        pos.play(move, turn)
+        history.append((move, turn))
+        if pos.wins_at(move):
+            winner = turn
+            break
+        turn = other(turn)
+    for move, _ in reversed(history):
+        pos.undo(move)
+    return winner, history
+
+
+class SearchTree:
+    """
+    A search tree that survives between moves, kept in a NodeStore of at
+    most max_nodes slots. Before each search, reroot() looks for the current
+    position among the old root's descendants so statistics gathered on
+    earlier turns are reused; everything outside that subtree is freed.
+    """
+
+    def __init__(self, max_reuse_depth=2, max_nodes=MAX_NODES):
+        self.max_nodes = max_nodes
+        self.store = NodeStore(max_nodes)
+        self.root = None  # node number of the root
+        self.root_player = None  # player who moved into the root position
+        self.root_pos = None
+        self.root_hashes = None  # (zobrist, mirror zobrist) of the root, when a table is used
+        self.max_reuse_depth = max_reuse_depth
+        self.reused = 0  # visits carried over into the current root
+
+    def node(self):
+        # View of the root
+        return Node(self.store, self.root, self.root_player)
+
+    def reroot(self, pos, player, hashes=None):
+        # Make the node for pos (player to move) the root, reusing a subtree if possible
+        if self.store.columns != pos.geo.columns:
+            self.store = NodeStore(self.max_nodes, pos.geo.columns)
+            self.root = None
+        store = self.store
+        reusable = self.root is not None and self.root_pos.geo is pos.geo
+        node = self._find(pos, player) if reusable else None
+        if node is None:
+            store.reset()
+            node = store.alloc() * store.columns
+            store.untried[node] = pos.legal_mask()
+        elif node != self.root:
+            store.keep(node)
+        self.root = node
+        self.root_player = other(player)
+        self.root_pos = pos.copy()
+        self.root_hashes = hashes
+        self.reused = store.visits[node]
+        return self.node()
+
+    def _find(self, pos, player):
+        store = self.store
+        frontier = [(self.root, self.root_player, self.root_pos)]
+        for _ in range(self.max_reuse_depth + 1):
+            next_frontier = []
+            for node, mover, node_pos in frontier:
+                if node_pos.bits == pos.bits and other(mover) == player:
+                    return node
+                block, mask = store.children[node], store.expanded[node]
+                if block < 0:
+                    continue
+                for col in range(store.columns):
+                    if mask >> col & 1:
+                        child_pos = node_pos.copy()
+                        child_pos.play(col, other(mover))
+                        next_frontier.append((block * store.columns + col, other(mover), child_pos))
+            frontier = next_frontier
+        return None
+
+
+class _NoLock:
+    # Stand-in for a lock when a single thread owns the tree
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_LOCK = _NoLock()
+
+
+class Simulator:
+    """
+    One selection / expansion / simulation / backpropagation pass, shared by
+    the single-threaded search() and the multi-threaded tree_parallel_search().
+    With locks, node statistics are updated under a striped lock and every
+    node on the selected path carries `virtual_loss` extra unrewarded visits
+    until its result is backed up, which steers other threads elsewhere.
+    With an instrument.SearchStats, each phase is timed and counted.
+    With a solver.Solver, new nodes small enough for it are solved exactly and
+    become terminal nodes holding the proven result, so they are never simulated;
+    proofs stop once they have used one leaf limit plus PROOF_RATE solver nodes
+    per simulation run, and resume as more simulations are run.
+    A full node store is pruned before the next simulation (single-threaded);
+    tree-parallel threads stop expanding instead.
+    """
+
+    def __init__(self, tree, policy, rollout=None, batch=None, tt=None, locks=None, virtual_loss=0,
+                 stats=None, solver=None):
+        self.tree = tree
+        self.store = tree.store
+        self.score = SCORES[policy]
+        self.use_rave = policy == "rave"
+        self.rollout = rollout or (center_rollout if self.use_rave else random_rollout)
+        self.stats = stats
+        if stats is not None and self.rollout is random_rollout:
+            self.rollout = timed_rollout(stats)
+        self.batch = batch
+        self.tt = tt
+        self.solver = solver
+        self.proof_nodes = 0  # solver nodes spent on proofs
+        self.simulations = 0
+        self.locks = locks
+        self.tt_lock = threading.Lock() if locks else NO_LOCK
+        self.store_lock = threading.Lock() if locks else NO_LOCK
+        self.virtual_loss = virtual_loss if locks else 0
+        if batch:
+            from batch_rollout import batch_playouts
+            self.batch_playouts = batch_playouts
+
+    def lock_for(self, node):
+        locks = self.locks
+        return locks[node & (len(locks) - 1)] if locks else NO_LOCK
+
+    def table_q(self, hashes, col, height, mover, n, q, geo):
+        # Mean value from the transposition table when it has seen the position more often
+        tt = self.tt
+        slot = tt.probe(canonical(zobrist_step(hashes, col, height, mover, geo)))
+        if slot >= 0 and tt.visits[slot] > n:
+            return tt.wins[slot] / tt.visits[slot]
+        return q
+
+    def can_prove(self, pos):
+        # Whether pos is small enough for the solver and proofs are within their share of the work
+        solver = self.solver
+        return (solver.applies(pos)
+                and self.proof_nodes < solver.leaf_nodes + PROOF_RATE * self.simulations)
+
+    def prove(self, node, mover, pos, hashes):
+        # Mark node terminal with its solved result, if the solver finishes in its leaf limit
+        solver = self.solver
+        nodes = solver.nodes
+        with self.tt_lock:
+            result = solver.solve(pos, other(mover), hashes, solver.leaf_nodes)
+        self.proof_nodes += solver.nodes - nodes
+        if self.stats is not None:
+            self.stats.count("solver_nodes", solver.nodes - nodes)
+        if result is None:
+            return
+        value = result[0]
+        winner = other(mover) if value > 0 else mover if value < 0 else 'D'
+        self.store.terminal[node] = TERMINAL_CODES[winner]
+        self.store.untried[node] = 0
+        if self.stats is not None:
+            self.stats.count("proven")
+
+    def run(self, pos, budget):
+        # One simulation (or one mini-batch of at most budget playouts) from the root.
+        # pos must be this thread's own copy of the root position; it is restored.
+        # Returns (playouts done, first move on the path).
+        store, tree = self.store, self.tree
+        score, tt, vl = self.score, self.tt, self.virtual_loss
+        stats = self.stats
+        if stats is not None:
+            t0 = clock()
+        if self.locks is None and store.full():
+            dropped = store.prune(tree.root)
+            if stats is not None:
+                stats.count("nodes_pruned", dropped)
+        visits, wins, children = store.visits, store.wins, store.children
+        untried, expanded, terminal = store.untried, store.expanded, store.terminal
+        heights, geo, columns = pos.heights, pos.geo, store.columns
+        node = tree.root
+        player = tree.root_player
+        hashes = tree.root_hashes
+        path, players, hash_path = [node], [player], [hashes]
+        first_move = None
+
+        # Selection: descend through fully expanded nodes
+        while True:
+            with self.lock_for(node):
+                if untried[node] or not expanded[node] or terminal[node]:
+                    break
+                mover = other(player)
+                base = children[node] * columns
+                mask = expanded[node]
+                log_total = math.log(visits[node] + 1)
+                best, best_score = -1, -math.inf
+                for col in range(columns):
+                    if not mask >> col & 1:
+                        continue
+                    child = base + col
+                    n = visits[child]
+                    if not n:
+                        best = child
+                        break
+                    q = wins[child] / n
+                    if tt is not None:
+                        q = self.table_q(hashes, col, heights[col], mover, n, q, geo)
+                    s = score(store, child, q, log_total)
+                    if s > best_score:
+                        best, best_score = child, s
+            node, col, player = best, best - base, mover
+            if vl:
+                with self.lock_for(node):
+                    visits[node] += vl
+            if tt is not None:
+                hashes = zobrist_step(hashes, col, heights[col], player, geo)
+            pos.play(col, player)
+            path.append(node)
+            players.append(player)
+            hash_path.append(hashes)
+            if first_move is None:
+                first_move = col
+        selected = len(path) - 1
+        if stats is not None:
+            t1 = clock()
+            stats.add("selection", t1 - t0)
+            t0 = t1
+
+        # Expansion: add one untried move
+        with self.lock_for(node):
+            if untried[node] and not terminal[node]:
+                if children[node] < 0:
+                    with self.store_lock:
+                        children[node] = store.alloc()
+                if children[node] >= 0:
+                    mask = untried[node]
+                    moves = [col for col in range(columns) if mask >> col & 1]
+                    move = moves[random.randrange(len(moves))]
+                    untried[node] = mask & ~(1 << move)
+                    expanded[node] |= 1 << move
+                    mover = other(player)
+                    if tt is not None:
+                        hashes = zobrist_step(hashes, move, heights[move], mover, geo)
+                    pos.play(move, mover)
+                    child = children[node] * columns + move
+                    untried[child] = pos.legal_mask()
+                    if stats is not None:
+                        stats.count("nodes_created")
+                    if pos.wins_at(move):
+                        terminal[child] = TERMINAL_CODES[mover]
+                        untried[child] = 0
+                    elif pos.is_full():
+                        terminal[child] = TERMINAL_CODES['D']
+                    elif self.solver is not None and self.can_prove(pos):
+                        self.prove(child, mover, pos, hashes)
+                    result = TERMINALS[terminal[child]]
+                    if result is not None and tt is not None:
+                        with self.tt_lock:
+                            tt.store_value(canonical(hashes), 1 if result == mover else
+                                           0 if result == 'D' else -1)
+                    node, player = child, mover
+                    path.append(node)
+                    players.append(player)
+                    hash_path.append(hashes)
+                    if first_move is None:
+                        first_move = move
+        if stats is not None:
+            t1 = clock()
+            stats.add("expansion", t1 - t0)
+            t0 = t1
+
+        # Simulation
+        result = TERMINALS[terminal[node]]
+        if result is not None:
+            n = min(self.batch, budget) if self.batch else 1
+            red = n if result == 'R' else 0
+            yellow = n if result == 'Y' else 0
+            history = None
+        elif self.batch:
+            n = min(self.batch, budget)
+            outcomes = self.batch_playouts(pos, 'R', other(player), n)
+            red = int((outcomes == 1).sum())
+            yellow = int((outcomes == -1).sum())
+            history = None
+        else:
+            n = 1
+            winner, history = self.rollout(pos, other(player))
+            if isinstance(winner, float):
+                # A rollout cut off early scores the position instead: R's share of the result
+                red, yellow = winner, 1.0 - winner
+            else:
+                red = 1 if winner == 'R' else 0
+                yellow = 1 if winner == 'Y' else 0
+            if stats is not None and history is not None:
+                stats.rollout_done(len(history))
+        draws = n - red - yellow
+        if stats is not None:
+            t1 = clock()
+            stats.add("rollout", t1 - t0)
+            t0 = t1
+
+        # Backpropagation (and AMAF updates for RAVE)
+        use_rave = self.use_rave
+        seen = {'R': 0, 'Y': 0}  # columns each player played below the node, as masks
+        if use_rave and history:
+            for col, mover in history:
+                seen[mover] |= 1 << col
+        rave_visits, rave_wins = store.rave_visits, store.rave_wins
+        for depth in range(len(path) - 1, -1, -1):
+            node, player = path[depth], players[depth]
+            won = (red if player == 'R' else yellow) + 0.5 * draws
+            with self.lock_for(node):
+                # Nodes from the selected one up (not the root) carry a virtual loss
+                visits[node] += n - (vl if 0 < depth <= selected else 0)
+                wins[node] += won
+                if use_rave:
+                    # RAVE counts are refreshed under the parent's lock only
+                    mover = other(player)
+                    hits = expanded[node] & seen[mover]
+                    if hits:
+                        base = children[node] * columns
+                        rave_won = (red if mover == 'R' else yellow) + 0.5 * draws
+                        for col in range(columns):
+                            if hits >> col & 1:
+                                rave_visits[base + col] += n
+                                rave_wins[base + col] += rave_won
+            if tt is not None:
+                with self.tt_lock:
+                    tt.update(canonical(hash_path[depth]), n, won)
+            if depth:
+                col = node % columns
+                pos.undo(col)
+                seen[player] |= 1 << col
+        if stats is not None:
+            stats.add("backprop", clock() - t0)
+            stats.count("simulations", n)
+        self.simulations += n
+        return n, first_move
+
+
+def search(pos, player, sims, policy="uct", tree=None, rollout=None, batch=None,
+           on_simulation=None, tt=None, stats=None, solver=None):
+    """
+    Run `sims` simulations of selection, expansion, simulation and backpropagation
+    from pos with player to move, and return the root node. `sims` may also be
+    a budget.Budget, to stop on a deadline; its `sims` then holds the count run.
+    policy picks the child score ("uct", "rave" or "pb"); rollout(pos, turn)
+    returns (winner, history), where the winner may also be R's score as a
+    float from 0 to 1 for a rollout that stopped before the end.
+    With batch=N each leaf gets N NumPy playouts.
+    With a transposition.TranspositionTable, results are also added to the
+    table entry of every position on the path, and selection uses the
+    table's value for positions reached through other move orders.
+    stats (an instrument.SearchStats) collects per-phase timings and counters.
+    With a solver.Solver, endgame nodes carry proven results instead of playouts.
+    """
+    if tree is None:
+        tree = SearchTree()
+    root = tree.reroot(pos, player, zobrist(pos) if tt is not None else None)
+    simulator = Simulator(tree, policy, rollout, batch, tt, stats=stats, solver=solver)
+    budget = sims if isinstance(sims, Budget) else Budget(sims)
+    if budget.started is None:
+        budget.start()
+    if stats is not None and tt is not None:
+        hits, misses = tt.hits, tt.misses
+    pos = pos.copy()
+    while not budget.done():
+        n, first_move = simulator.run(pos, budget.remaining())
+        budget.spend(n)
+        if on_simulation is not None:
+            if stats is None:
+                on_simulation(budget.sims, root, first_move)
+            else:
+                t0 = clock()
+                on_simulation(budget.sims, root, first_move)
+                stats.add("output", clock() - t0)
+    if stats is not None and tt is not None:
+        stats.count("tt_hits", tt.hits - hits)
+        stats.count("tt_misses", tt.misses - misses)
+    return root
+
+
+def gil_enabled():
+    # False only on a free-threaded CPython build running with the GIL disabled
+    check = getattr(sys, "_is_gil_enabled", None)
+    return True if check is None else check()
+
+
+def tree_parallel_search(pos, player, sims, policy="uct", tree=None, threads=4,
+                         virtual_loss=3, tt=None, force=False, stats=None, rollout=None):
+    """
+    Tree parallelization: `threads` threads descend one shared tree, each on its
+    own copy of the position, until `sims` simulations are done in total
+    (or a budget.Budget runs out; its counters are shared loosely by the threads).
+    With the GIL enabled threads cannot run simulations at the same time, so
+    this falls back to the single-threaded search() unless force=True.
+    """
+    if threads <= 1 or (gil_enabled() and not force):
+        return search(pos, player, sims, policy, tree, rollout, tt=tt, stats=stats)
+    if tree is None:
+        tree = SearchTree()
+    root = tree.reroot(pos, player, zobrist(pos) if tt is not None else None)
+    locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+    simulator = Simulator(tree, policy, rollout, tt=tt, locks=locks, virtual_loss=virtual_loss, stats=stats)
+    budget = sims if isinstance(sims, Budget) else None
+    counter = itertools.count()  # claims simulation slots without a lock
+
+    def worker():
+        own_pos = pos.copy()
+        if budget is None:
+            while next(counter) < sims:
+                simulator.run(own_pos, 1)
+        else:
+            while not budget.done():
+                simulator.run(own_pos, 1)
+                budget.spend(1)
+
+    if budget is not None and budget.started is None:
+        budget.start()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return root
+
+
+def best_child(root):
+    # Final choice: a proven win, otherwise the most visited child not proven lost
+    children = root.children
+    for child in children:
+        if child.terminal == child.player:
+            return child
+    alive = [c for c in children if c.terminal != other(c.player)]
+    return max(alive or children, key=lambda c: (c.visits, c.wins))
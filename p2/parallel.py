@@ -0,0 +1,77 @@
+import hashlib
+import multiprocessing
+import os
+import random
+
+import mcts
+from budget import Budget
+
+
+def stream_seed(*parts):
+    # Independent 64-bit seed derived from (base seed, call, worker, ...)
+    digest = hashlib.sha256(repr(parts).encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def _search_task(args):
+    # Runs in a worker process: one independent search with its own RNG stream
+    pos, player, sims, time_ms, policy, playout, seed = args
+    random.seed(seed)
+    rollout = playout.rollout_for(policy) if playout is not None else None
+    root = mcts.search(pos, player, Budget(sims, time_ms), policy, rollout=rollout)
+    return {child.move: (child.wins, child.visits, child.rave_wins, child.rave_visits,
+                         child.terminal == child.player)
+            for child in root.children}
+
+
+class RootParallel:
+    """
+    Root parallelization over a persistent process pool: the simulation budget
+    is split across the workers, each grows its own tree from the same root
+    with its own seed, and the root children's statistics are summed.
+    Create one and pass it to run_uct/run_uct_rave (pool=...) for every move
+    of a game so the worker processes are only started once.
+    """
+
+    def __init__(self, workers=None, seed=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.calls = 0
+        self.pool = multiprocessing.Pool(self.workers)
+
+    def search(self, pos, player, sims, policy="uct", time_ms=None, playout=None):
+        # Returns {col: [wins, visits, rave_wins, rave_visits, immediate_win]} summed over workers.
+        # With time_ms every worker searches until the deadline (sims may then be None).
+        # playout is a playout.PlayoutPolicy for the workers' rollouts (None: the tree policy's own).
+        self.calls += 1
+        if sims is None:
+            shares = [None] * self.workers
+        else:
+            share, extra = divmod(sims, self.workers)
+            shares = [share + (i < extra) for i in range(self.workers)]
+        tasks = [(pos, player, shares[i], time_ms, policy, playout, stream_seed(self.seed, self.calls, i))
+                 for i in range(self.workers) if shares[i] is None or shares[i] > 0]
+        merged = {}
+        for stats in self.pool.map(_search_task, tasks):
+            for move, values in stats.items():
+                total = merged.setdefault(move, [0.0, 0, 0.0, 0, 0])
+                for i, v in enumerate(values):
+                    total[i] += v
+        return merged
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def best_move(merged):
+    # A column that wins on the spot, otherwise the most visited across all workers
+    return max(merged, key=lambda m: (merged[m][4] > 0, merged[m][1], merged[m][0]))
@@ -0,0 +1,180 @@
+import random
+
+from position import random_playout
+from evaluate import evaluate
+
+
+class PlayoutPolicy:
+    """
+    How a simulation picks its moves after leaving the tree. With tactics, a
+    move that wins at once is always taken, and otherwise a move that blocks
+    the opponent's immediate win; the winning cells of each side are kept as
+    threat masks, built once per playout and extended from the window table
+    as pieces are played. Any other move is uniformly random with probability
+    epsilon, else the first playable column of `preferred` (by default the
+    board's columns from the center outwards).
+    With a cutoff, a playout still going after that many moves stops and
+    scores the position with evaluate.evaluate instead (with tactics, a side
+    to move that can win at once is scored as the winner).
+    """
+
+    def __init__(self, tactics=True, epsilon=1.0, preferred=None, cutoff=None):
+        self.tactics = tactics
+        self.epsilon = epsilon
+        self.preferred = None if preferred is None else tuple(preferred)
+        self.cutoff = cutoff
+        # Same as position.random_playout
+        self.uniform = not tactics and epsilon >= 1.0 and cutoff is None
+
+    def __repr__(self):
+        return (f"PlayoutPolicy(tactics={self.tactics}, epsilon={self.epsilon}, "
+                f"preferred={self.preferred and list(self.preferred)}, cutoff={self.cutoff})")
+
+    def with_cutoff(self, cutoff):
+        # This policy with rollouts cut off after `cutoff` moves
+        return PlayoutPolicy(self.tactics, self.epsilon, self.preferred, cutoff)
+
+    def playout(self, pos, current_player, turn, rng=random):
+        # Same contract as position.random_playout: +1/-1/0 from current_player's side,
+        # or an evaluation between -1 and 1 for a playout that was cut off
+        if self.uniform:
+            return random_playout(pos, current_player, turn, rng)
+        winner = self.run(pos, turn, None, rng)
+        if isinstance(winner, float):
+            return 2 * winner - 1 if current_player == 'R' else 1 - 2 * winner
+        return 0 if winner is None else 1 if winner == current_player else -1
+
+    def rollout(self, pos, turn):
+        # mcts rollout: (winner or None, None); a cut-off rollout gives R's score (0 to 1) instead
+        return self.run(pos, turn, None), None
+
+    def amaf_rollout(self, pos, turn):
+        # mcts rollout that also returns the (col, player) moves, for RAVE
+        history = []
+        return self.run(pos, turn, history), history
+
+    def rollout_for(self, tree_policy):
+        # The mcts rollout for a tree policy ("uct", "rave" or "pb"); RAVE needs the moves
+        return self.amaf_rollout if tree_policy == "rave" else self.rollout
+
+    def score(self, pos, turn):
+        # R's expected score (0 to 1) where a playout is cut off, turn to move
+        if self.tactics:
+            geo = pos.geo
+            occupied = pos.bits[0] | pos.bits[1]
+            if (geo.winning_cells(pos.bits[turn != 'R'], occupied)
+                    & (occupied + geo.bottom_mask) & geo.board_mask):
+                return 1.0 if turn == 'R' else 0.0
+        return (1.0 + evaluate(pos, 'R')) / 2
+
+    def run(self, pos, turn, history=None, rng=random):
+        # Play pos out with turn to move and restore it; returns the winner ('R'/'Y') or None,
+        # or after `cutoff` moves R's expected score as a float from 0 to 1.
+        # Moves are appended to history as (col, player) when it is a list.
+        heights, bits, geo = pos.heights, pos.bits, pos.geo
+        rows, h1, cell_windows = geo.rows, geo.h1, geo.cell_windows
+        bottom_mask, board_mask, columns = geo.bottom_mask, geo.board_mask, range(geo.columns)
+        line = geo.k - 1  # pieces of a window that make it a threat
+        tactics, epsilon = self.tactics, self.epsilon
+        preferred = self.preferred or geo.center_order
+        cutoff = self.cutoff if self.cutoff is not None else geo.cells
+        draw, choice = rng.random, rng.choice
+        occupied = bits[0] | bits[1]
+        if tactics:
+            threats = [geo.winning_cells(bits[0], occupied), geo.winning_cells(bits[1], occupied)]
+        played = []
+        winner = None
+        while True:
+            playable = (occupied + bottom_mask) & board_mask
+            if not playable:
+                break
+            idx = turn != 'R'
+            if len(played) >= cutoff:
+                if tactics and threats[idx] & playable:
+                    winner = turn
+                else:
+                    winner = (1.0 + evaluate(pos, 'R')) / 2
+                break
+            col = -1
+            if tactics:
+                cells = threats[idx] & playable
+                if cells:
+                    winner = turn
+                else:
+                    cells = threats[not idx] & playable
+                if cells:
+                    cells &= -cells
+                    col = (cells.bit_length() - 1) // h1
+            if col < 0:
+                if epsilon >= 1.0 or (epsilon > 0.0 and draw() < epsilon):
+                    col = choice([c for c in columns if heights[c] < rows])
+                else:
+                    col = next(c for c in preferred if heights[c] < rows)
+            index = col * h1 + heights[col]
+            cell = 1 << index
+            mine = bits[idx] | cell
+            bits[idx] = mine
+            occupied |= cell
+            heights[col] += 1
+            played.append(col)
+            if history is not None:
+                history.append((col, turn))
+            if tactics:
+                if winner is not None:
+                    break
+                # A move that is not a threat cell cannot win; it can only add threats
+                found = threats[idx]
+                for window in cell_windows[index]:
+                    own = mine & window
+                    if own.bit_count() == line:
+                        found |= window ^ own
+                threats[idx] = found
+            else:
+                for window in cell_windows[index]:
+                    if mine & window == window:
+                        winner = turn
+                        break
+                if winner is not None:
+                    break
+            turn = 'Y' if turn == 'R' else 'R'
+        pos.moves += len(played)
+        for col in reversed(played):
+            pos.undo(col)
+        return winner
+
+    def choose(self, pos, turn, rng=random):
+        # The policy's move for turn in pos, one at a time (for traced simulations)
+        geo = pos.geo
+        if self.tactics:
+            occupied = pos.bits[0] | pos.bits[1]
+            playable = (occupied + geo.bottom_mask) & geo.board_mask
+            idx = turn != 'R'
+            cells = (geo.winning_cells(pos.bits[idx], occupied) & playable
+                     or geo.winning_cells(pos.bits[not idx], occupied) & playable)
+            if cells:
+                return ((cells & -cells).bit_length() - 1) // geo.h1
+        if self.epsilon >= 1.0 or (self.epsilon > 0.0 and rng.random() < self.epsilon):
+            return rng.choice(pos.legal_moves())
+        return next(c for c in self.preferred or geo.center_order if pos.can_play(c))
+
+
+# Named policies, as accepted by the engines' `playout` argument
+PLAYOUTS = {
+    "random": PlayoutPolicy(tactics=False, epsilon=1.0),
+    "center": PlayoutPolicy(tactics=False, epsilon=0.0),
+    "tactical": PlayoutPolicy(tactics=True, epsilon=1.0),
+    "heavy": PlayoutPolicy(tactics=True, epsilon=0.5),
+}
+
+
+def playout_policy(playout, cutoff=None, default="random"):
+    # A PlayoutPolicy from a policy or a PLAYOUTS name, None staying None (the engine's own
+    # rollouts). With a cutoff, that policy (or the named default) cut off after cutoff moves.
+    if playout is None and cutoff is None:
+        return None
+    if not isinstance(playout, PlayoutPolicy):
+        name = default if playout is None else playout
+        if name not in PLAYOUTS:
+            raise ValueError(f"Unknown playout policy {name}; choose from {', '.join(PLAYOUTS)}.")
+        playout = PLAYOUTS[name]
+    return playout if cutoff is None else playout.with_cutoff(cutoff)
@@ -0,0 +1,117 @@
+import multiprocessing
+import random
+
+import mcts
+from book import open_book
+from connect4 import TREE_POLICIES, engine_options, check_win_at, legal_moves, make_move
+from playout import playout_policy
+from position import ROWS, COLUMNS, EMPTY, Position, other
+
+PONDER_CHUNK = 64  # simulations between checks for the opponent's move
+PONDER_LIMIT = 200000  # most simulations pondered on one opponent move (bounds tree growth)
+
+
+def _player_main(conn, alg, param, time_ms, book_path, seed, ponder_limit, playout):
+    # Runs in a player process: answer "move" requests, and ponder in between
+    random.seed(seed)
+    tree = mcts.SearchTree()
+    book = open_book(book_path) if book_path else None
+    policy = TREE_POLICIES.get(alg)
+    playout = playout_policy(playout)
+    rollout = playout.rollout_for(policy) if playout is not None else None
+    while True:
+        msg = conn.recv()
+        if msg[0] == "stop":
+            break
+        if msg[0] == "move":
+            _, board, player = msg
+            _, move = alg(board, player, param, verbose=False,
+                          **engine_options(alg, time_ms, tree, book=book, playout=playout))
+            conn.send((move, tree.reused))
+        elif msg[0] == "ponder" and policy is not None:
+            # Grow the tree for the opponent's position until their move comes in
+            _, board, player = msg
+            pos = Position.from_board(board)
+            tree.reroot(pos, player)
+            simulator = mcts.Simulator(tree, policy, rollout)
+            pondered = 0
+            while pondered < ponder_limit and not conn.poll():
+                for _ in range(PONDER_CHUNK):
+                    simulator.run(pos, 1)
+                pondered += PONDER_CHUNK
+
+
+class Player:
+    """
+    One side of a game in its own process, holding its search tree between
+    moves. While the opponent decides, ponder() has it keep searching the
+    opponent's position with its own tree policy, so when the reply arrives
+    the engine reroots into the matching subtree and starts from the visits
+    pondered there. Engines without a tree (PMCGS, UR) just wait.
+    """
+
+    def __init__(self, alg, param, time_ms=None, book_path=None, seed=None, ponder_limit=PONDER_LIMIT,
+                 playout=None):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_player_main, args=(child, alg, param, time_ms, book_path, seed, ponder_limit, playout),
+            daemon=True)
+        self.process.start()
+        child.close()
+        self.reused = []  # visits found in the tree at the start of each move
+
+    def move(self, board, player):
+        # The engine's column for board with player to move (stops any pondering)
+        self.conn.send(("move", board, player))
+        move, reused = self.conn.recv()
+        self.reused.append(reused)
+        return move
+
+    def ponder(self, board, player):
+        # Start searching board, player to move, in the background
+        self.conn.send(("ponder", board, player))
+
+    def close(self):
+        if self.process is not None:
+            self.conn.send(("stop",))
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def play_pondered_game(alg1, alg2, param1, param2, time_ms1=None, time_ms2=None, book_path=None,
+                       seed=None, stats=None, playout=None):
+    """
+    play_game with both sides in their own processes, each pondering on the
+    other's time. Returns the winner ('R'/'Y') or 'D'. Pondering depends on
+    timing, so games are not reproducible from the seed alone. With a stats
+    dict, stats[side] gets the list of visits each move started from.
+    playout is a playout policy (or its name) for both sides' simulations.
+    """
+    seed = random.getrandbits(64) if seed is None else seed
+    board = [[EMPTY] * COLUMNS for _ in range(ROWS)]
+    player = 'R'
+    with Player(alg1, param1, time_ms1, book_path, seed ^ 1, playout=playout) as red, \
+            Player(alg2, param2, time_ms2, book_path, seed ^ 2, playout=playout) as yellow:
+        players = {'R': red, 'Y': yellow}
+        while True:
+            players[other(player)].ponder(board, player)
+            move = players[player].move(board, player)
+            board = make_move(board, move, player)
+
+            row = next(r for r in range(ROWS) if board[r][move] != EMPTY)
+            if check_win_at(board, row, move, player):
+                winner = player
+                break
+            if not legal_moves(board):
+                winner = 'D'
+                break
+            player = other(player)
+        if stats is not None:
+            stats['R'], stats['Y'] = red.reused, yellow.reused
+    return winner
@@ -0,0 +1,295 @@
+import random
+
+# Standard board geometry (other sizes are runtime parameters, see geometry())
+ROWS = 6
+COLUMNS = 7
+CONNECT = 4  # pieces in a row that win
+EMPTY = 'O'
+MAX_SIZE = 64  # most rows or columns of a board read from outside (a node store's mask width)
+MAX_GEOMETRIES = 16  # board shapes geometry() keeps
+PLAYERS = ('R', 'Y')
+
+
+def other(player):
+    return 'Y' if player == 'R' else 'R'
+
+
+class Geometry:
+    """
+    The shape shared by every Position on one kind of board: `rows` x
+    `columns`, `k` in a row to win, and the bitboard tables derived from it.
+    Each column uses rows bits plus one sentinel bit on top, so shifted lines
+    never wrap from one column into the next; masks are Python ints, so any
+    size works. Get instances from geometry(), which keeps one per shape.
+    """
+    __slots__ = ("rows", "columns", "k", "h1", "cells", "bottom_mask", "board_mask", "directions",
+                 "windows", "cell_windows", "center_order")
+
+    def __init__(self, rows, columns, k):
+        if rows < 1 or columns < 1 or not 2 <= k <= max(rows, columns):
+            raise ValueError(f"No {k}-in-a-row game on a {columns}x{rows} board.")
+        self.rows, self.columns, self.k = rows, columns, k
+        self.h1 = h1 = rows + 1
+        self.cells = rows * columns
+        self.bottom_mask = sum(1 << (col * h1) for col in range(columns))
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)
+        # Shifts for the four line directions: vertical, horizontal, and the two diagonals
+        self.directions = (1, h1, h1 - 1, h1 + 1)
+        self.windows, self.cell_windows = self._build_windows()
+        # Columns from the center outwards
+        self.center_order = tuple(sorted(range(columns), key=lambda col: abs(2 * col - (columns - 1))))
+
+    def __repr__(self):
+        return f"geometry({self.rows}, {self.columns}, {self.k})"
+
+    def __reduce__(self):
+        # Unpickle to the shared instance, so `is` comparisons hold across processes
+        return geometry, (self.rows, self.columns, self.k)
+
+    def bit(self, col, height):
+        # Bit of cell (col, height), height 0 being the bottom row
+        return 1 << (col * self.h1 + height)
+
+    def _build_windows(self):
+        # Every k-cell line on the board, as a bitmask, plus the lines through each cell
+        rows, columns, k = self.rows, self.columns, self.k
+        windows = []
+        cell_windows = [() for _ in range(columns * self.h1)]
+        for dcol, dheight in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            for col in range(columns):
+                for height in range(rows):
+                    cells = [(col + i * dcol, height + i * dheight) for i in range(k)]
+                    if not all(0 <= c < columns and 0 <= h < rows for c, h in cells):
+                        continue
+                    window = sum(self.bit(c, h) for c, h in cells)
+                    windows.append(window)
+                    for c, h in cells:
+                        cell_windows[c * self.h1 + h] += (window,)
+        return tuple(windows), tuple(cell_windows)
+
+    def has_line(self, bits):
+        # Shift-based test for k in a row on a single player's mask: runs of length
+        # `run` are doubled until one more shift reaches k
+        k = self.k
+        for shift in self.directions:
+            m, run = bits, 1
+            while 2 * run <= k:
+                m &= m >> (run * shift)
+                run *= 2
+            if run < k:
+                m &= m >> ((k - run) * shift)
+            if m:
+                return True
+        return False
+
+    def winning_cells(self, bits, occupied):
+        # Empty cells that would complete a line for the player with mask bits
+        # (every direction at once; occupied is both players' pieces)
+        if self.k == 4:
+            cells = (bits << 1) & (bits << 2) & (bits << 3)
+            for shift in self.directions[1:]:
+                pair = (bits << shift) & (bits << 2 * shift)
+                cells |= pair & (bits << 3 * shift)
+                cells |= pair & (bits >> shift)
+                pair = (bits >> shift) & (bits >> 2 * shift)
+                cells |= pair & (bits << shift)
+                cells |= pair & (bits >> 3 * shift)
+            return cells & self.board_mask & ~occupied
+        cells = 0
+        k = self.k
+        for shift in self.directions:
+            # The empty cell is the gap-th of the line's k cells
+            for gap in range(k):
+                line = -1
+                for i in range(k):
+                    if i != gap:
+                        offset = (i - gap) * shift
+                        line &= bits >> offset if offset > 0 else bits << -offset
+                cells |= line
+        return cells & self.board_mask & ~occupied
+
+
+_geometries = {}
+
+
+def geometry(rows=ROWS, columns=COLUMNS, k=CONNECT):
+    # The shared Geometry for a board shape. Past MAX_GEOMETRIES shapes the oldest one
+    # other than the standard board is forgotten, and is built afresh if asked for again.
+    shape = (rows, columns, k)
+    geo = _geometries.get(shape)
+    if geo is None:
+        geo = Geometry(rows, columns, k)
+        if len(_geometries) >= MAX_GEOMETRIES:
+            del _geometries[next(old for old in _geometries if old != (ROWS, COLUMNS, CONNECT))]
+        _geometries[shape] = geo
+    return geo
+
+
+STANDARD = geometry()
+
+
+class Position:
+    """
+    Bitboard game state: one mask per player plus the height of each column,
+    on the board shape `geo` (a Geometry; the standard 7x6 connect-four board
+    by default). Column heights count pieces from the bottom, so list-board
+    row rows - 1 - height is where the next piece in that column lands.
+    """
+    __slots__ = ("bits", "heights", "moves", "geo")
+
+    def __init__(self, geo=None):
+        self.geo = geo = geo or STANDARD
+        self.bits = [0, 0]  # R mask, Y mask
+        self.heights = [0] * geo.columns
+        self.moves = 0
+
+    @classmethod
+    def from_board(cls, board, k=CONNECT):
+        # Build a position from the 'R'/'Y'/'O' list-of-lists board; its size sets the geometry
+        rows, columns = len(board), len(board[0])
+        pos = cls(geometry(rows, columns, k))
+        h1 = pos.geo.h1
+        for col in range(columns):
+            for height in range(rows):
+                cell = board[rows - 1 - height][col]
+                if cell == EMPTY:
+                    break
+                pos.bits[PLAYERS.index(cell)] |= 1 << (col * h1 + height)
+                pos.heights[col] = height + 1
+                pos.moves += 1
+        return pos
+
+    def to_board(self):
+        # Convert back to the list-of-lists board used by read_input/update_board_player
+        rows, columns, h1 = self.geo.rows, self.geo.columns, self.geo.h1
+        board = [[EMPTY] * columns for _ in range(rows)]
+        red, yellow = self.bits
+        for col in range(columns):
+            for height in range(self.heights[col]):
+                b = 1 << (col * h1 + height)
+                board[rows - 1 - height][col] = 'R' if red & b else 'Y' if yellow & b else EMPTY
+        return board
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.bits = self.bits[:]
+        pos.heights = self.heights[:]
+        pos.moves = self.moves
+        pos.geo = self.geo
+        return pos
+
+    def can_play(self, col):
+        return self.heights[col] < self.geo.rows
+
+    def legal_moves(self):
+        heights, rows = self.heights, self.geo.rows
+        return [col for col in range(len(heights)) if heights[col] < rows]
+
+    def legal_mask(self):
+        # Legal moves as a bitmask, bit c set when column c can be played
+        heights, rows = self.heights, self.geo.rows
+        return sum(1 << col for col in range(len(heights)) if heights[col] < rows)
+
+    def play(self, col, player):
+        # Drop a piece for player in col; returns the list-board row it landed on
+        height = self.heights[col]
+        self.bits[player != 'R'] |= 1 << (col * self.geo.h1 + height)
+        self.heights[col] = height + 1
+        self.moves += 1
+        return self.geo.rows - 1 - height
+
+    def undo(self, col):
+        # Remove the top piece of col, whichever player owns it
+        height = self.heights[col] - 1
+        mask = ~(1 << (col * self.geo.h1 + height))
+        self.bits[0] &= mask
+        self.bits[1] &= mask
+        self.heights[col] = height
+        self.moves -= 1
+
+    def is_win(self, player):
+        return self.geo.has_line(self.bits[player != 'R'])
+
+    def wins_at(self, col):
+        # True if the top piece of col completes a line. Only the lines through
+        # that cell (at most 13 on the standard board) are tested, on its owner's mask.
+        geo = self.geo
+        index = col * geo.h1 + self.heights[col] - 1
+        red = self.bits[0]
+        bits = red if red >> index & 1 else self.bits[1]
+        for window in geo.cell_windows[index]:
+            if bits & window == window:
+                return True
+        return False
+
+    def is_full(self):
+        return self.moves == self.geo.cells
+
+    def empty_cells(self):
+        return self.geo.cells - self.moves
+
+    def key(self):
+        # Unique integer key for the position (both masks packed together)
+        return self.bits[0] | (self.bits[1] << (self.geo.h1 * self.geo.columns))
+
+    def __eq__(self, other_pos):
+        return (isinstance(other_pos, Position) and self.geo is other_pos.geo
+                and self.bits == other_pos.bits)
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+def parse_rows(rows, k=CONNECT):
+    # Position from a list of row strings (top row first), or a ValueError.
+    # Any size up to MAX_SIZE works, as long as every row has as many cells and k in a row fits.
+    if (not isinstance(rows, list) or not rows or not isinstance(rows[0], str) or not rows[0]
+            or any(not isinstance(row, str) or len(row) != len(rows[0]) for row in rows)):
+        raise ValueError("A board is a list of strings, all with the same number of cells.")
+    if len(rows) > MAX_SIZE or len(rows[0]) > MAX_SIZE:
+        raise ValueError(f"A board has at most {MAX_SIZE} rows and {MAX_SIZE} columns.")
+    if any(cell not in PLAYERS and cell != EMPTY for row in rows for cell in row):
+        raise ValueError(f"Board cells are {', '.join(PLAYERS)} or {EMPTY}.")
+    return Position.from_board([list(row) for row in rows], k)
+
+
+def side_to_move(pos):
+    # 'R' when both players have as many pieces, else 'Y'
+    red = bin(pos.bits[0]).count("1")
+    return 'R' if red == pos.moves - red else 'Y'
+
+
+def random_playout(pos, current_player, turn, rng=random):
+    # Play random moves from pos (turn to move) until the game ends, then undo them.
+    # Returns +1 if current_player wins, -1 if the other player wins, 0 for a draw.
+    heights = pos.heights
+    bits = pos.bits
+    geo = pos.geo
+    rows, h1, cell_windows = geo.rows, geo.h1, geo.cell_windows
+    columns = range(geo.columns)
+    played = []
+    result = 0
+    choice = rng.choice
+    while True:
+        moves = [col for col in columns if heights[col] < rows]
+        if not moves:
+            break
+        col = choice(moves)
+        idx = turn != 'R'
+        index = col * h1 + heights[col]
+        mine = bits[idx] | (1 << index)
+        bits[idx] = mine
+        heights[col] += 1
+        played.append(col)
+        # Only lines through the new piece can have been completed
+        for window in cell_windows[index]:
+            if mine & window == window:
+                result = 1 if turn == current_player else -1
+                break
+        if result:
+            break
+        turn = 'Y' if turn == 'R' else 'R'
+    pos.moves += len(played)
+    for col in reversed(played):
+        pos.undo(col)
+    return result
@@ -0,0 +1,403 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+import zlib
+
+from connect4 import run_pmcgs, ALGORITHMS, TREE_ENGINES, TIMED_ENGINES, TT_ENGINES, BOOK_ENGINES
+from position import PLAYERS, Position, other, parse_rows, side_to_move
+from mcts import SearchTree
+from budget import Budget
+from transposition import TranspositionTable
+from book import BOOK_FILE, open_book
+
+# Long-running engine server: JSON requests, one per line, on stdin/stdout or a Unix socket.
+# Usage: python server.py [--socket PATH] [--shards N] [--book FILE]
+#
+# Every request is an object with a "cmd", an optional "id" that is echoed back, and
+# the "game" it belongs to. Columns are 1-based, boards are lists of row strings from
+# the top, as in the input files.
+#   new       start (or restart) a game: "algorithm", "param", "time_ms", "table",
+#             and optionally "board" and "player"
+#   position  set the game's board (and "player"; by default the side with fewer pieces)
+#   play      play "column" for the side to move, e.g. the opponent's reply
+#   go        search, play and return the engine's "column" with its stats
+#   end       forget the game
+#   stats     server counters (no game needed)
+#   quit      stop reading requests (stdin) or close the connection (socket)
+# "column", "param" and "time_ms" are whole numbers (see MAX_SIMS and MAX_TIME_MS).
+# Replies carry "error" instead when a request fails. Games are spread over shard
+# processes by id; requests for one game are answered in order, replies for
+# different games may come back in any order.
+
+DEFAULT_SIMS = 1000
+MAX_SIMS = 10000000  # largest "param" a request may ask for
+MAX_TIME_MS = 600000  # largest "time_ms" a request may ask for (ten minutes)
+TABLE_ENTRIES = 1 << 14  # per-game transposition table, for games that ask for one
+
+
+def whole_number(msg, name, low, high, default=None):
+    # msg[name] as an int from low to high (None when absent and no default), or a ValueError
+    value = msg.get(name, default)
+    if value is None:
+        return None
+    if (isinstance(value, bool) or not isinstance(value, (int, float))
+            or not math.isfinite(value) or value != int(value) or not low <= value <= high):
+        raise ValueError(f"{name} must be a whole number from {low} to {high}.")
+    return int(value)
+
+
+class Session:
+    """
+    One game: its position and side to move, its engine settings, and the
+    search tree (and optional table) kept warm from one move to the next.
+    """
+
+    def __init__(self, algorithm="UCT", param=DEFAULT_SIMS, time_ms=None, table=False):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm {algorithm}; choose from {', '.join(ALGORITHMS)}.")
+        self.algorithm = algorithm
+        self.engine = ALGORITHMS[algorithm]
+        self.param = param
+        self.time_ms = time_ms
+        self.tree = SearchTree()
+        self.tt = TranspositionTable(TABLE_ENTRIES) if table and self.engine in TT_ENGINES else None
+        self.set_position(Position(), 'R')
+
+    def set_position(self, pos, player):
+        self.pos = pos
+        self.player = player
+        self.winner = ('R' if pos.is_win('R') else 'Y' if pos.is_win('Y')
+                       else 'D' if pos.is_full() else None)
+
+    def play(self, col):
+        # Play col for the side to move; returns the winner ('R'/'Y', 'D' for a draw) or None
+        if self.winner is not None:
+            raise ValueError("The game is over.")
+        if not (0 <= col < self.pos.geo.columns and self.pos.can_play(col)):
+            raise ValueError(f"Column {col + 1} is not a legal move.")
+        self.pos.play(col, self.player)
+        if self.pos.wins_at(col):
+            self.winner = self.player
+        elif self.pos.is_full():
+            self.winner = 'D'
+        self.player = other(self.player)
+        return self.winner
+
+    def search(self, book=None, param=None, time_ms=None):
+        # The engine's move for the side to move, and its stats
+        if self.winner is not None:
+            raise ValueError("The game is over.")
+        engine = self.engine
+        param = self.param if param is None else param
+        time_ms = self.time_ms if time_ms is None else time_ms
+        options = {}
+        budget = None
+        if engine in TIMED_ENGINES:
+            # PMCGS counts its simulations per column
+            sims = param * len(self.pos.legal_moves()) if engine is run_pmcgs and param else param
+            options["budget"] = budget = Budget(sims, time_ms)
+        if engine in TREE_ENGINES:
+            options["tree"] = self.tree
+        if self.tt is not None:
+            options["tt"] = self.tt
+        if book is not None and engine in BOOK_ENGINES:
+            options["book"] = book
+        start = time.perf_counter()
+        _, move = engine(self.pos.to_board(), self.player, param, False, **options)
+        stats = {
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+            "sims": budget.sims if budget is not None else 0,
+            # Book and solver moves skip the search, and so the tree
+            "reused": self.tree.reused if engine in TREE_ENGINES and budget.sims else 0,
+        }
+        return move, stats
+
+
+class Engine:
+    """
+    The games of one process and the handler for their requests.
+    handle() takes a request dict and returns the reply dict.
+    book is a book.OpeningBook shared by all the games, or None.
+    """
+
+    def __init__(self, book=None):
+        self.sessions = {}
+        self.book = book
+
+    def handle(self, msg):
+        reply = {"id": msg.get("id"), "game": msg.get("game")}
+        try:
+            command = self.COMMANDS.get(msg.get("cmd"))
+            if command is None:
+                raise ValueError(f"Unknown command {msg.get('cmd')!r}.")
+            reply.update(command(self, msg))
+        except (ValueError, TypeError) as e:
+            reply["error"] = str(e)
+        except Exception as e:  # a bad request must not stop the shard
+            reply["error"] = f"{type(e).__name__}: {e}"
+        return reply
+
+    def session(self, msg):
+        session = self.sessions.get(msg.get("game"))
+        if session is None:
+            raise ValueError(f"No game {msg.get('game')!r}; send \"new\" first.")
+        return session
+
+    def cmd_new(self, msg):
+        session = Session(msg.get("algorithm", "UCT"),
+                          whole_number(msg, "param", 1, MAX_SIMS, DEFAULT_SIMS),
+                          whole_number(msg, "time_ms", 1, MAX_TIME_MS), msg.get("table", False))
+        self.sessions[msg.get("game")] = session
+        if "board" in msg:
+            return self.cmd_position(msg)
+        return {"player": session.player, "winner": None}
+
+    def cmd_position(self, msg):
+        session = self.session(msg)
+        pos = parse_rows(msg["board"]) if "board" in msg else Position()
+        player = msg.get("player") or side_to_move(pos)
+        if player not in PLAYERS:
+            raise ValueError(f"Player is one of {', '.join(PLAYERS)}.")
+        session.set_position(pos, player)
+        return {"player": session.player, "winner": session.winner}
+
+    def cmd_play(self, msg):
+        session = self.session(msg)
+        if "column" not in msg:
+            raise ValueError("play needs a column.")
+        winner = session.play(whole_number(msg, "column", 1, session.pos.geo.columns) - 1)
+        return {"player": session.player, "winner": winner}
+
+    def cmd_go(self, msg):
+        session = self.session(msg)
+        mover = session.player
+        move, stats = session.search(self.book, whole_number(msg, "param", 1, MAX_SIMS),
+                                     whole_number(msg, "time_ms", 1, MAX_TIME_MS))
+        winner = session.play(move)
+        return {"column": move + 1, "player": mover, "winner": winner, "stats": stats}
+
+    def cmd_end(self, msg):
+        return {"ended": self.sessions.pop(msg.get("game"), None) is not None}
+
+    COMMANDS = {"new": cmd_new, "position": cmd_position, "play": cmd_play, "go": cmd_go,
+                "end": cmd_end}
+
+
+def _shard_main(conn, book_path):
+    # Runs in a shard process: answer requests until the pipe sends None
+    engine = Engine(open_book(book_path))
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        conn.send(engine.handle(msg) if isinstance(msg, dict) else
+                  {"id": None, "error": "Bad request: expected a JSON object."})
+
+
+class Shard:
+    """
+    One engine process and the thread that feeds it. Requests queue up and
+    are sent one at a time, so the games on a shard see them in order.
+    With process=False the Engine runs in this process instead.
+    """
+
+    def __init__(self, book_path=BOOK_FILE, process=True):
+        self.conn = self.process = self.engine = None
+        if process:
+            self.conn, child = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(target=_shard_main, args=(child, book_path),
+                                                   daemon=True)
+            self.process.start()
+            child.close()
+        else:
+            self.engine = Engine(open_book(book_path))
+        self.queue = queue.Queue()
+        self.games = set()
+        self.requests = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, msg, callback):
+        self.queue.put((msg, callback))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            msg, callback = item
+            start = time.perf_counter()
+            try:
+                if self.engine is not None:
+                    reply = self.engine.handle(msg)
+                else:
+                    self.conn.send(msg)
+                    reply = self.conn.recv()
+            except (EOFError, OSError):
+                reply = {"id": msg.get("id"), "game": msg.get("game"), "error": "Engine process stopped."}
+            except Exception as e:  # answer every request, so callers waiting on it go on
+                reply = {"id": msg.get("id"), "game": msg.get("game"), "error": f"{type(e).__name__}: {e}"}
+            seconds = time.perf_counter() - start
+            self.requests += 1
+            self.busy_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if "error" not in reply:
+                if msg.get("cmd") == "new":
+                    self.games.add(msg.get("game"))
+                elif msg.get("cmd") == "end":
+                    self.games.discard(msg.get("game"))
+            callback(reply)
+            self.queue.task_done()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.process is not None:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass  # the process already stopped
+            self.process.join()
+            self.conn.close()
+
+
+class Server:
+    """
+    Routes requests to shards by game id (a stable hash, so a game always
+    lands on the same process and keeps its tree warm there).
+    shards=0 serves every game from this process.
+    """
+
+    def __init__(self, shards=None, book_path=BOOK_FILE):
+        if shards is None:
+            shards = os.cpu_count() or 1
+        self.shards = ([Shard(book_path, process=False)] if shards == 0
+                       else [Shard(book_path) for _ in range(shards)])
+        self.started = time.perf_counter()
+
+    def shard_for(self, game):
+        return self.shards[zlib.crc32(repr(game).encode()) % len(self.shards)]
+
+    def submit(self, msg, callback):
+        # Handle one request dict; callback(reply) is called from a shard thread
+        if msg.get("cmd") == "stats":
+            callback(dict(self.stats(), id=msg.get("id")))
+        else:
+            self.shard_for(msg.get("game")).submit(msg, callback)
+
+    def stats(self):
+        requests = sum(shard.requests for shard in self.shards)
+        busy = sum(shard.busy_seconds for shard in self.shards)
+        return {
+            "shards": len(self.shards),
+            "games": sum(len(shard.games) for shard in self.shards),
+            "requests": requests,
+            "mean_ms": round(busy / requests * 1000, 3) if requests else 0.0,
+            "max_ms": round(max(shard.max_seconds for shard in self.shards) * 1000, 3),
+            "uptime_s": round(time.perf_counter() - self.started, 3),
+        }
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def serve_lines(server, lines, write):
+    # Answer every JSON request in `lines`, passing each reply line to write();
+    # returns once all of them are answered or a quit request is read
+    done = threading.Condition()
+    outstanding = 0
+
+    def respond(reply):
+        nonlocal outstanding
+        text = json.dumps(reply) + "\n"
+        with done:
+            write(text)
+            outstanding -= 1
+            done.notify_all()
+
+    for line in lines:
+        if not line.strip():
+            continue
+        with done:
+            outstanding += 1
+        try:
+            msg = json.loads(line)
+        except json.JSONDecodeError as e:
+            respond({"id": None, "error": f"Bad request: {e}"})
+            continue
+        if not isinstance(msg, dict):
+            respond({"id": None, "error": "Bad request: expected a JSON object."})
+            continue
+        if msg.get("cmd") == "quit":
+            respond({"id": msg.get("id"), "bye": True})
+            break
+        server.submit(msg, respond)
+    with done:
+        done.wait_for(lambda: outstanding == 0)
+
+
+def serve_stdio(server):
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    serve_lines(server, sys.stdin, write)
+
+
+class _Connection(socketserver.StreamRequestHandler):
+    # One client connection to the Unix socket
+
+    def handle(self):
+        def write(text):
+            try:
+                self.wfile.write(text.encode())
+                self.wfile.flush()
+            except OSError:
+                pass  # the client went away; its games stay until "end"
+        serve_lines(self.server.engines, (line.decode() for line in self.rfile), write)
+
+
+def serve_socket(server, path):
+    if os.path.exists(path):
+        os.unlink(path)
+    with socketserver.ThreadingUnixStreamServer(path, _Connection) as listener:
+        listener.daemon_threads = True
+        listener.engines = server
+        try:
+            listener.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect Four engine server")
+    parser.add_argument("--socket", help="listen on this Unix socket instead of stdin/stdout")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="engine processes (default: all cores; 0 runs games in this process)")
+    parser.add_argument("--book", default=BOOK_FILE, help="opening book file, used if it exists")
+    args = parser.parse_args()
+
+    with Server(args.shards, args.book) as server:
+        try:
+            if args.socket:
+                serve_socket(server, args.socket)
+            else:
+                serve_stdio(server)
+        except KeyboardInterrupt:
+            pass
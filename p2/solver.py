@@ -0,0 +1,152 @@
+from position import other
+from transposition import TranspositionTable, zobrist, zobrist_step, canonical
+
+SOLVE_EMPTY = 14  # engines solve exactly once this few cells are empty
+MAX_NODES = 100000  # node limit of one solve() before giving up
+LEAF_NODES = 2000  # node limit when proving a single tree node during a search
+EXACT = 127  # table depth of a result that holds however deep one searches
+
+
+class _OutOfNodes(Exception):
+    pass
+
+
+def winning_moves(pos, player):
+    # Columns where player would complete a line with their next piece, center first
+    heights, geo = pos.heights, pos.geo
+    rows, h1, cell_windows = geo.rows, geo.h1, geo.cell_windows
+    bits = pos.bits[player != 'R']
+    wins = []
+    for col in geo.center_order:
+        height = heights[col]
+        if height < rows:
+            index = col * h1 + height
+            mine = bits | (1 << index)
+            for window in cell_windows[index]:
+                if mine & window == window:
+                    wins.append(col)
+                    break
+    return wins
+
+
+class Solver:
+    """
+    Exact negamax alpha-beta search for endgames. Values are from the side
+    to move: +1 a forced win, -1 a forced loss, 0 a draw. Searches deepen one
+    ply at a time, so the first win found is the quickest one, and every
+    result is kept in a transposition.TranspositionTable (pass the one a
+    search already uses to share it; otherwise one is made on first use). Moves are tried center first; an
+    immediate win ends a node, and an opponent threat forces the block.
+    """
+
+    def __init__(self, tt=None, threshold=SOLVE_EMPTY, max_nodes=MAX_NODES, leaf_nodes=LEAF_NODES):
+        self.tt = tt
+        self.threshold = threshold
+        self.max_nodes = max_nodes
+        self.leaf_nodes = leaf_nodes
+        self.nodes = 0  # positions visited over all calls
+        self.limit = 0
+        self.solved = 0
+        self.failed = 0
+
+    def applies(self, pos):
+        # Whether pos is small enough for this solver
+        return pos.empty_cells() <= self.threshold
+
+    def solve(self, pos, player, hashes=None, max_nodes=None):
+        """
+        Solve pos with player to move. Returns (value, move), move being the
+        quickest win, a drawing move, or the move that holds out longest; or
+        None if the node limit ran out first. pos is left unchanged.
+        """
+        if self.tt is None:
+            self.tt = TranspositionTable(1 << 16)
+        pos = pos.copy()
+        if hashes is None:
+            hashes = zobrist(pos)
+        self.limit = self.nodes + (self.max_nodes if max_nodes is None else max_nodes)
+        moves = pos.legal_moves()
+        if not moves:
+            return 0, None
+        wins = winning_moves(pos, player)
+        if wins:
+            self.solved += 1
+            return 1, wins[0]
+        held = None  # move that survived the previous, shallower iteration
+        try:
+            for depth in range(2, pos.empty_cells() + 1):
+                value, move = self._root(pos, player, depth, hashes)
+                if value != 0 or depth == pos.empty_cells():
+                    self.solved += 1
+                    return value, (held if value < 0 and held is not None else move)
+                held = move
+        except _OutOfNodes:
+            self.failed += 1
+            return None
+        return 0, held  # not reached: the last depth always decides
+
+    def _root(self, pos, player, depth, hashes):
+        best, best_move, alpha = -2, None, -1
+        for col in self._moves(pos, player):
+            height = pos.heights[col]
+            pos.play(col, player)
+            value = -self._negamax(pos, other(player), depth - 1, -1, -alpha,
+                                   zobrist_step(hashes, col, height, player, pos.geo))
+            pos.undo(col)
+            if value > best:
+                best, best_move = value, col
+                if value > alpha:
+                    alpha = value
+                if value == 1:
+                    break
+        return best, best_move
+
+    def _moves(self, pos, player):
+        # Center-first moves, or just the block when the opponent threatens a win
+        threats = winning_moves(pos, other(player))
+        if threats:
+            return threats[:1]
+        heights, rows = pos.heights, pos.geo.rows
+        return [col for col in pos.geo.center_order if heights[col] < rows]
+
+    def _negamax(self, pos, player, depth, alpha, beta, hashes):
+        self.nodes += 1
+        if self.nodes > self.limit:
+            raise _OutOfNodes
+        empty = pos.empty_cells()
+        if empty == 0:
+            return 0
+        if winning_moves(pos, player):
+            return 1
+        if depth <= 1:
+            return 0  # horizon: nothing proven within depth
+        # The table holds values from the side of the player who moved in
+        key = canonical(hashes)
+        stored = self.tt.get_value(key, depth)
+        if stored is not None:
+            return -stored
+        threats = winning_moves(pos, other(player))
+        if len(threats) > 1:
+            value = -1  # only one of the threats can be blocked
+        else:
+            window = alpha, beta
+            value = -2
+            moves = threats or [col for col in pos.geo.center_order if pos.heights[col] < pos.geo.rows]
+            for col in moves:
+                height = pos.heights[col]
+                pos.play(col, player)
+                score = -self._negamax(pos, other(player), depth - 1, -beta, -alpha,
+                                       zobrist_step(hashes, col, height, player, pos.geo))
+                pos.undo(col)
+                if score > value:
+                    value = score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            break
+            # Wins and losses are exact whatever the window; a draw only inside it
+            if value == 0 and not window[0] < 0 < window[1]:
+                return value
+        exact = value != 0 or depth >= empty
+        self.tt.store_value(key, -value, EXACT if exact else depth)
+        return value
@@ -0,0 +1,57 @@
+import math
+
+
+def elo_to_score(elo):
+    # Expected score of a player rated `elo` points above its opponent
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class SPRT:
+    """
+    Sequential probability ratio test between H0: elo = elo0 and H1: elo = elo1,
+    with false-positive rate alpha and false-negative rate beta. Uses the
+    normal approximation of the trinomial (win/draw/loss) log-likelihood ratio.
+    Feed results with update(); `decision` becomes "H0" or "H1" once a bound is crossed.
+    """
+
+    def __init__(self, elo0=0, elo1=10, alpha=0.05, beta=0.05):
+        self.elo0, self.elo1 = elo0, elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = self.draws = self.losses = 0
+        self.llr = 0.0
+        self.trajectory = []  # LLR after each game
+        self.decision = None
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def update(self, result):
+        # result from the tested engine's side: 1 win, 0.5 draw, 0 loss
+        if result == 1:
+            self.wins += 1
+        elif result == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        self.llr = self.compute_llr()
+        self.trajectory.append(self.llr)
+        if self.decision is None:
+            if self.llr >= self.upper:
+                self.decision = "H1"
+            elif self.llr <= self.lower:
+                self.decision = "H0"
+        return self.decision
+
+    def compute_llr(self):
+        # Half a pseudo-win and half a pseudo-loss keep the variance away from
+        # zero while every game so far has had the same result.
+        n = self.games
+        wins, losses = self.wins + 0.5, self.losses + 0.5
+        total = wins + self.draws + losses
+        score = (wins + 0.5 * self.draws) / total
+        variance = (wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2
+                    + losses * score ** 2) / total
+        s0, s1 = elo_to_score(self.elo0), elo_to_score(self.elo1)
+        return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
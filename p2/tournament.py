@@ -1,24 +1,45 @@
-from connect4 import run_ur, run_pmcgs, run_uct, check_win, legal_moves, run_uct_pb, run_uct_rave
+import argparse
+import json
+import multiprocessing
+import multiprocessing.pool
+import os
+import random
+import time
+
+from connect4 import run_ur, run_pmcgs, run_uct, check_win_at, legal_moves, run_uct_pb, run_uct_rave, engine_options
+from book import open_book
+from playout import PLAYOUTS
+from ponder import play_pondered_game
+from mcts import SearchTree
+from parallel import stream_seed
+from sprt import SPRT
+from position import ROWS, COLUMNS, EMPTY
 
 # Board setup
-ROWS, COLUMNS = 6, 7
-EMPTY = 'O'
 
-def make_empty_board():
-    return [[EMPTY for _ in range(COLUMNS)] for _ in range(ROWS)]
+def make_empty_board(rows=ROWS, columns=COLUMNS):
+    return [[EMPTY for _ in range(columns)] for _ in range(rows)]
 
-def play_game(alg1, alg2, param1, param2):
+def play_game(alg1, alg2, param1, param2, pool=None, time_ms1=None, time_ms2=None, book=None,
+              playout=None):
+    # pool: an optional parallel.RootParallel used by run_uct/run_uct_rave on every move
+    # time_ms1/time_ms2: per-move time budgets (param may then be None)
+    # book: an optional book.OpeningBook both sides play from before searching
+    # playout: an optional playout policy (see playout.PLAYOUTS) for both sides' simulations
     board = make_empty_board()
     player = 'R'
     other_player = 'Y'
+    # Each tree engine keeps its own search tree for the whole game
+    trees = {'R': SearchTree(), 'Y': SearchTree()}
 
     while True:
-        if player == 'R':
-            board, _ = alg1(board, player, param1, verbose=False)
-        else:
-            board, _ = alg2(board, player, param2, verbose=False)
+        alg, param, time_ms = (alg1, param1, time_ms1) if player == 'R' else (alg2, param2, time_ms2)
+        options = engine_options(alg, time_ms, trees[player], pool, book, playout)
+        board, move = alg(board, player, param, verbose=False, **options)
 
-        if check_win(board, player):
+        # Only the piece just dropped in column `move` can complete a line
+        row = next(r for r in range(len(board)) if board[r][move] != EMPTY)
+        if check_win_at(board, row, move, player):
             return player
         if not legal_moves(board):
             return 'D'
@@ -34,71 +55,223 @@ algorithms = [
     ("UCT10000", run_uct, 10000)
 ]
 
-results = {}
+# Head-to-head matches: (match name, red player, yellow player)
+improved_tests = [
+    ("UCT_PB vs UCT10000", ("UCT_PB", run_uct_pb, 10000), ("UCT10000", run_uct, 10000)),
+    ("UCT_Rave vs UCT10000", ("UCT_Rave", run_uct_rave, 10000), ("UCT10000", run_uct, 10000)),
+]
+
 games_per_matchup = 100
+DEFAULT_LOG = "tournament_results.jsonl"
 
-for name1, alg1, param1 in algorithms:
-    results[name1] = {}
-    for name2, alg2, param2 in algorithms:
-        wins1 = 0
-        for _ in range(games_per_matchup):
-            winner = play_game(alg1, alg2, param1, param2)
-            if winner == 'R':
-                wins1 += 1
-        win_rate = wins1 / games_per_matchup
-        results[name1][name2] = win_rate
-
-# Print the results table
-print(f"{'':12}", end="")
-for name2, _, _ in algorithms:
-    print(f"{name2:12}", end="")
-print()
-
-for name1 in results:
-    print(f"{name1:12}", end="")
-    for name2 in results[name1]:
-        print(f"{results[name1][name2]:<12.2f}", end="")
-    print()
 
-# --- IMPROVED UCT TEST ---
-print("Testing UCT_PB vs UCT10000...")
-uct_improved_wins = 0
-uct_baseline_wins = 0
-draws = 0
-num_games = 100
-
-for _ in range(num_games):
-    winner = play_game(run_uct_pb, run_uct, 10000, 10000)
-    if winner == 'R':
-        uct_improved_wins += 1
-    elif winner == 'Y':
-        uct_baseline_wins += 1
-    else:
-        draws += 1
-
-print("\nUCT_PB vs UCT10000 Results:")
-print(f"UCT_PB wins: {uct_improved_wins}/{num_games}")
-print(f"UCT10000 wins: {uct_baseline_wins}/{num_games}")
-print(f"Draws: {draws}/{num_games}")
-
-
-# --- IMPROVED UCT TEST 2 ---
-print("Testing UCB_Rave vs UCT10000...")
-uct_improved_wins = 0
-uct_baseline_wins = 0
-draws = 0
-num_games = 100
-
-for _ in range(num_games):
-    winner = play_game(run_uct_rave, run_uct, 10000, 10000)
-    if winner == 'R':
-        uct_improved_wins += 1
-    elif winner == 'Y':
-        uct_baseline_wins += 1
+# --- Tournament engine ---
+def game_seed(match, game):
+    # Deterministic seed for one game, independent of which worker plays it
+    return stream_seed("tournament", match, game)
+
+
+def make_jobs(match, red, yellow, num_games, book=None, ponder=False, playout=None):
+    # One job per game; red/yellow are (name, algorithm, param) entries, book a book file path.
+    # With ponder, each side runs in its own process and searches on the opponent's time.
+    # playout names the playout policy of the searching engines (None: each engine's own).
+    return [{"match": match, "game": game, "red": red, "yellow": yellow,
+             "seed": game_seed(match, game), "book": book, "ponder": ponder, "playout": playout}
+            for game in range(num_games)]
+
+
+def job_key(job):
+    # What identifies a game in the results log: its match and number, and the settings it
+    # was played with (records from before settings were logged were played with the defaults)
+    return (job["match"], job["game"], job.get("book"), job.get("ponder", False), job.get("playout"))
+
+
+def play_job(job):
+    # Runs in a worker process: play one seeded game and describe the result.
+    # Pondered games run in a worker thread instead, with the sides in their own processes.
+    (red_name, alg1, param1), (yellow_name, alg2, param2) = job["red"], job["yellow"]
+    start = time.perf_counter()
+    if job["ponder"]:
+        winner = play_pondered_game(alg1, alg2, param1, param2, book_path=job["book"], seed=job["seed"],
+                                    playout=job["playout"])
     else:
-        draws += 1
+        random.seed(job["seed"])
+        book = open_book(job["book"]) if job["book"] else None
+        winner = play_game(alg1, alg2, param1, param2, book=book, playout=job["playout"])
+    return {"match": job["match"], "game": job["game"], "red": red_name, "yellow": yellow_name,
+            "seed": job["seed"], "book": job["book"], "ponder": job["ponder"], "playout": job["playout"],
+            "winner": winner, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def load_results(log_path):
+    # Finished games from the results log by job_key; a line cut off by a kill is ignored
+    results = {}
+    if not os.path.exists(log_path):
+        return results
+    with open(log_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[job_key(record)] = record
+    return results
+
+
+def run_games(jobs, log_path=DEFAULT_LOG, workers=None, on_result=None):
+    """
+    Play every job not already in the results log with the same settings
+    across a process pool, appending each game to the log as soon as it
+    finishes, so an interrupted run picks up where it stopped. Returns the
+    log's records for these jobs. If on_result(record) returns True the run
+    stops early and only the records seen so far are returned. Records are
+    passed to on_result in job order whatever order the games finish in (a
+    finished game waits for those before it), so a resumed run stops at the
+    same game. Pondered games are run from threads, as each one starts its
+    own two player processes.
+    """
+    done = load_results(log_path)
+    seen = []
+
+    def advance():
+        # Pass on the records now available in job order; True once on_result stops the run
+        while len(seen) < len(jobs) and job_key(jobs[len(seen)]) in done:
+            record = done[job_key(jobs[len(seen)])]
+            seen.append(record)
+            if on_result is not None and on_result(record):
+                return True
+        return False
+
+    if advance():
+        return seen
+    pending = [job for job in jobs if job_key(job) not in done]
+    if pending:
+        ponder = any(job["ponder"] for job in pending)
+        if ponder:
+            workers = workers or max(1, (os.cpu_count() or 1) // 2)
+            pool = multiprocessing.pool.ThreadPool(workers)
+        else:
+            pool = multiprocessing.Pool(workers or os.cpu_count() or 1)
+        with open(log_path, "a+") as log, pool:
+            # Terminate a line left unfinished by a killed run before appending
+            if log.tell() > 0:
+                log.seek(log.tell() - 1)
+                if log.read(1) != "\n":
+                    log.write("\n")
+            for record in pool.imap_unordered(play_job, pending):
+                log.write(json.dumps(record) + "\n")
+                log.flush()
+                done[job_key(record)] = record
+                if advance():
+                    pool.terminate()  # drop the games still in flight
+                    return seen
+    return [done[job_key(job)] for job in jobs]
+
+
+def count_results(records):
+    # (red wins, yellow wins, draws)
+    winners = [r["winner"] for r in records]
+    return winners.count('R'), winners.count('Y'), winners.count('D')
 
-print("\nUCT_Rave vs UCT10000 Results:")
-print(f"UCT_Rave wins: {uct_improved_wins}/{num_games}")
-print(f"UCT10000 wins: {uct_baseline_wins}/{num_games}")
-print(f"Draws: {draws}/{num_games}")
\ No newline at end of file
+
+def matchup_name(name1, name2):
+    return f"{name1} vs {name2}"
+
+
+def run_round_robin(log_path=DEFAULT_LOG, workers=None, num_games=games_per_matchup, book=None,
+                    ponder=False, playout=None):
+    # Red win rate of every pairing of `algorithms`, read back from the results log
+    jobs = []
+    for entry1 in algorithms:
+        for entry2 in algorithms:
+            jobs += make_jobs(matchup_name(entry1[0], entry2[0]), entry1, entry2, num_games, book, ponder,
+                              playout)
+    records = run_games(jobs, log_path, workers)
+    results = {}
+    for name1, _, _ in algorithms:
+        results[name1] = {}
+        for name2, _, _ in algorithms:
+            match = matchup_name(name1, name2)
+            wins1, _, _ = count_results([r for r in records if r["match"] == match])
+            results[name1][name2] = wins1 / num_games
+    return results
+
+
+def print_table(results):
+    # Print the results table
+    print(f"{'':12}", end="")
+    for name2, _, _ in algorithms:
+        print(f"{name2:12}", end="")
+    print()
+
+    for name1 in results:
+        print(f"{name1:12}", end="")
+        for name2 in results[name1]:
+            print(f"{results[name1][name2]:<12.2f}", end="")
+        print()
+
+
+def run_improved_test(match, red, yellow, log_path=DEFAULT_LOG, workers=None, num_games=100, book=None,
+                      ponder=False, playout=None):
+    print(f"Testing {match}...")
+    records = run_games(make_jobs(match, red, yellow, num_games, book, ponder, playout), log_path, workers)
+    uct_improved_wins, uct_baseline_wins, draws = count_results(records)
+
+    print(f"\n{match} Results:")
+    print(f"{red[0]} wins: {uct_improved_wins}/{num_games}")
+    print(f"{yellow[0]} wins: {uct_baseline_wins}/{num_games}")
+    print(f"Draws: {draws}/{num_games}")
+
+
+def run_sprt_match(match, red, yellow, test, log_path=DEFAULT_LOG, workers=None, max_games=100, book=None,
+                   ponder=False, playout=None):
+    # Head-to-head match that stops as soon as the sprt.SPRT `test` is decided
+    print(f"Testing {match} (SPRT elo0={test.elo0}, elo1={test.elo1})...")
+
+    def on_result(record):
+        # Results are scored from the red (tested) engine's side
+        return test.update({'R': 1, 'Y': 0, 'D': 0.5}[record["winner"]]) is not None
+
+    records = run_games(make_jobs(match, red, yellow, max_games, book, ponder, playout), log_path, workers,
+                        on_result)
+    wins, losses, draws = count_results(records)
+
+    print(f"\n{match} Results:")
+    print(f"{red[0]} wins: {wins}/{test.games}")
+    print(f"{yellow[0]} wins: {losses}/{test.games}")
+    print(f"Draws: {draws}/{test.games}")
+    print(f"SPRT: {test.decision or 'undecided'} after {test.games} games "
+          f"(LLR {test.llr:.2f}, bounds [{test.lower:.2f}, {test.upper:.2f}]), "
+          f"{max_games - test.games} games saved")
+    print("LLR trajectory: " + " ".join(f"{llr:.2f}" for llr in test.trajectory))
+    return test
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect Four engine tournament")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="results log; rerun with the same log to resume")
+    parser.add_argument("--games", type=int, default=games_per_matchup, help="games per pairing")
+    parser.add_argument("--sprt", action="store_true", help="stop the improved-UCT matches early with an SPRT")
+    parser.add_argument("--elo0", type=float, default=0, help="SPRT null hypothesis (Elo)")
+    parser.add_argument("--elo1", type=float, default=50, help="SPRT alternative hypothesis (Elo)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="SPRT false-positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="SPRT false-negative rate")
+    parser.add_argument("--book", default=None, help="opening book file (see book.py) for the searching engines")
+    parser.add_argument("--ponder", action="store_true",
+                        help="let the tree engines search on the opponent's time (not reproducible)")
+    parser.add_argument("--playout", choices=list(PLAYOUTS), default=None,
+                        help="playout policy for the searching engines (default: each engine's own)")
+    args = parser.parse_args()
+
+    print_table(run_round_robin(args.log, args.workers, args.games, args.book, args.ponder, args.playout))
+
+    # --- IMPROVED UCT TESTS ---
+    for match, red, yellow in improved_tests:
+        if args.sprt:
+            test = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+            run_sprt_match(match, red, yellow, test, args.log, args.workers, args.games, args.book, args.ponder,
+                           args.playout)
+        else:
+            run_improved_test(match, red, yellow, args.log, args.workers, args.games, args.book, args.ponder,
+                              args.playout)
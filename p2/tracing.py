@@ -0,0 +1,63 @@
+import sys
+from collections import deque
+
+# Trace levels, most detailed first
+TRACE = 5    # every rollout move
+DEBUG = 10   # every simulation result and statistics update
+INFO = 20    # per-search summaries
+
+
+class Tracer:
+    """
+    Buffered, sampled trace sink for the engines' diagnostics.
+    Events are kept as (format, args) and only formatted when written, in
+    bulk, once `capacity` events are buffered or on flush(). Per-simulation
+    events (below INFO) are recorded only for every `sample_every`-th
+    simulation, as started with begin(). With ring=True the buffer is a
+    bounded ring that keeps just the latest `capacity` events and is written
+    only by flush(), e.g. on error.
+    """
+
+    def __init__(self, stream=None, path=None, level=TRACE, sample_every=1, capacity=4096, ring=False):
+        self.stream = stream if stream is not None or path is not None else sys.stdout
+        self.path = path
+        self.level = level
+        self.sample_every = max(1, sample_every)
+        self.capacity = capacity
+        self.ring = ring
+        self.buffer = deque(maxlen=capacity) if ring else []
+        self.simulations = 0
+        self.active = True  # whether per-simulation events of the current simulation are kept
+        self.dropped = 0
+
+    def begin(self):
+        # Start a simulation; returns whether its detailed events are sampled
+        self.active = self.simulations % self.sample_every == 0
+        self.simulations += 1
+        return self.active
+
+    def wants(self, level):
+        # Cheap check before building an event
+        return level >= self.level and (self.active or level >= INFO)
+
+    def event(self, level, fmt, *args):
+        if level < self.level or (level < INFO and not self.active):
+            return
+        buffer = self.buffer
+        if self.ring and len(buffer) == self.capacity:
+            self.dropped += 1
+        buffer.append((fmt, args))
+        if not self.ring and len(buffer) >= self.capacity:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        text = "".join((fmt % args if args else fmt) + "\n" for fmt, args in self.buffer)
+        self.buffer.clear()
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(text)
+        else:
+            self.stream.write(text)
+            self.stream.flush()
@@ -0,0 +1,162 @@
+import random
+from array import array
+
+from position import ROWS, COLUMNS, STANDARD
+
+# Zobrist keys: one random 64-bit number per (player, cell), cell = col * rows + height.
+# Fixed seed so keys (and anything stored under them, e.g. an opening book) are stable.
+_rng = random.Random(0x5EED_C4)
+ZOBRIST = (
+    [_rng.getrandbits(64) for _ in range(ROWS * COLUMNS)],
+    [_rng.getrandbits(64) for _ in range(ROWS * COLUMNS)],
+)
+del _rng
+_keys = {STANDARD: ZOBRIST}
+
+UNKNOWN = -128  # value slot of an entry with no proven result
+
+
+def zobrist_keys(geo):
+    # The Zobrist keys of a board geometry (ZOBRIST for the standard board), seeded by its shape
+    if geo not in _keys:
+        rng = random.Random(f"{0x5EED_C4}:{geo.rows}x{geo.columns}")
+        _keys[geo] = tuple([rng.getrandbits(64) for _ in range(geo.cells)] for _ in range(2))
+    return _keys[geo]
+
+
+def zobrist_step(hashes, col, height, player, geo=STANDARD):
+    # Update a (hash, mirror_hash) pair for a piece dropped at (col, height)
+    keys = (ZOBRIST if geo is STANDARD else zobrist_keys(geo))[player != 'R']
+    rows = geo.rows
+    return (hashes[0] ^ keys[col * rows + height],
+            hashes[1] ^ keys[(geo.columns - 1 - col) * rows + height])
+
+
+def zobrist(pos):
+    # (hash, mirror_hash) of a Position, computed from scratch
+    geo = pos.geo
+    hashes = (0, 0)
+    for idx, player in ((0, 'R'), (1, 'Y')):
+        bits = pos.bits[idx]
+        for col in range(geo.columns):
+            for height in range(pos.heights[col]):
+                if bits >> (col * geo.h1 + height) & 1:
+                    hashes = zobrist_step(hashes, col, height, player, geo)
+    return hashes
+
+
+def canonical(hashes):
+    # A position and its left-right mirror image share one key
+    return min(hashes)
+
+
+class TranspositionTable:
+    """
+    Fixed-size table keyed by canonical Zobrist hash. Each bucket has two
+    slots: a preferred slot that keeps the entry with more visits (or the
+    deeper proven result), and an always-replace slot for everything else.
+    Entries hold visit/win statistics from the side of the player who moved
+    into the position, and an optional proven value (+1 win, 0 draw, -1 loss)
+    with the depth it was proven to.
+    """
+
+    def __init__(self, max_entries=1 << 20):
+        buckets = 1
+        while buckets * 2 <= max_entries // 2:
+            buckets *= 2
+        self.size = buckets * 2
+        self.mask = buckets - 1
+        self.keys = array('Q', bytes(8 * self.size))
+        self.used = array('b', bytes(self.size))
+        self.visits = array('q', bytes(8 * self.size))
+        self.wins = array('d', bytes(8 * self.size))
+        self.value = array('b', [UNKNOWN]) * self.size
+        self.depth = array('b', bytes(self.size))
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def probe(self, key):
+        # Slot index holding key, or -1
+        slot = (key & self.mask) * 2
+        keys, used = self.keys, self.used
+        if used[slot] and keys[slot] == key:
+            self.hits += 1
+            return slot
+        if used[slot + 1] and keys[slot + 1] == key:
+            self.hits += 1
+            return slot + 1
+        self.misses += 1
+        return -1
+
+    def _slot_for(self, key, visits, depth):
+        # Slot to write key into, evicting according to the replacement policy
+        slot = (key & self.mask) * 2
+        for s in (slot, slot + 1):
+            if self.used[s] and self.keys[s] == key:
+                return s
+        preferred, spare = slot, slot + 1
+        if not self.used[preferred] or (visits, depth) >= (self.visits[preferred], self.depth[preferred]):
+            # Demote the old preferred entry to the spare slot
+            if self.used[preferred]:
+                if self.used[spare]:
+                    self.evictions += 1
+                self._copy(preferred, spare)
+            target = preferred
+        else:
+            if self.used[spare]:
+                self.evictions += 1
+            target = spare
+        self.keys[target] = key
+        self.used[target] = 1
+        self.visits[target] = 0
+        self.wins[target] = 0.0
+        self.value[target] = UNKNOWN
+        self.depth[target] = 0
+        self.stores += 1
+        return target
+
+    def _copy(self, src, dst):
+        self.keys[dst] = self.keys[src]
+        self.used[dst] = self.used[src]
+        self.visits[dst] = self.visits[src]
+        self.wins[dst] = self.wins[src]
+        self.value[dst] = self.value[src]
+        self.depth[dst] = self.depth[src]
+
+    def update(self, key, visits, wins):
+        # Add simulation results for a position
+        slot = self._slot_for(key, visits, 0)
+        self.visits[slot] += visits
+        self.wins[slot] += wins
+
+    def store_value(self, key, value, depth=0):
+        # Record a proven value (from the side of the player who moved into the position)
+        slot = self._slot_for(key, 0, depth)
+        if depth >= self.depth[slot] or self.value[slot] == UNKNOWN:
+            self.value[slot] = value
+            self.depth[slot] = min(depth, 127)
+
+    def get_value(self, key, depth=0):
+        # Proven value searched to at least depth, or None
+        slot = self.probe(key)
+        if slot < 0 or self.value[slot] == UNKNOWN or self.depth[slot] < depth:
+            return None
+        return self.value[slot]
+
+    def memory_bytes(self):
+        return sum(a.itemsize * len(a) for a in
+                   (self.keys, self.used, self.visits, self.wins, self.value, self.depth))
+
+    def stats(self):
+        filled = sum(self.used)
+        return {
+            "size": self.size,
+            "filled": filled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes": self.memory_bytes(),
+        }